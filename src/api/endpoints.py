@@ -1,12 +1,15 @@
+import asyncio
 import time
 import uuid
 from datetime import datetime
-from typing import AsyncIterator, Optional
+from types import AsyncGeneratorType
+from typing import AsyncGenerator, Optional
 
 import httpx
+import orjson
 import tiktoken
 from fastapi import APIRouter, HTTPException, Request, Header, Depends
-from fastapi.responses import JSONResponse, StreamingResponse
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 
 from src.conversion.request_converter import convert_claude_to_openai
 from src.conversion.response_converter import (
@@ -30,15 +33,147 @@ router = APIRouter()
 # Get custom headers from config
 custom_headers = config.get_custom_headers()
 
+_pool_limits = httpx.Limits(
+    max_connections=config.max_connections,
+    max_keepalive_connections=config.max_keepalive_connections,
+    keepalive_expiry=config.keepalive_expiry,
+)
+
+# Explicit pool for the OpenAI SDK, sized like the passthrough pool, so the
+# module-level openai_client reuses keep-alive connections across requests
+# rather than relying on the SDK's default transport settings. With HTTP/2
+# (negotiated via ALPN, HTTP/1.1 otherwise) concurrent streams share a
+# connection instead of each holding one for the whole response.
+openai_http_client = httpx.AsyncClient(
+    timeout=httpx.Timeout(config.request_timeout, connect=10.0),
+    limits=_pool_limits,
+    http2=config.enable_http2,
+)
+
 openai_client = OpenAIClient(
     config.openai_api_key,
     config.openai_base_url,
     config.request_timeout,
     api_version=config.azure_api_version,
     custom_headers=custom_headers,
+    http_client=openai_http_client,
+    max_retries=config.max_retries,
+)
+
+# Shared pool for Anthropic passthrough so keep-alive connections (and their
+# TLS sessions) are reused across requests instead of re-handshaking per call.
+passthrough_client = httpx.AsyncClient(
+    timeout=httpx.Timeout(config.request_timeout, connect=10.0),
+    limits=_pool_limits,
+    http2=config.enable_http2,
 )
 
 
+# Headers for SSE responses; X-Accel-Buffering stops nginx-style proxies from
+# holding events back until their buffer fills.
+_SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    "Connection": "keep-alive",
+    "X-Accel-Buffering": "no",
+    "Access-Control-Allow-Origin": "*",
+    "Access-Control-Allow-Headers": "*",
+}
+
+
+# Flush a coalesced batch early once it reaches this size
+_COALESCE_MAX_BYTES = 16384
+
+
+async def _coalesce_frames(
+    stream: AsyncGenerator[bytes, None], window: float
+) -> AsyncGenerator[bytes, None]:
+    """Batch SSE frames that arrive within `window` seconds into one write.
+
+    The first frame goes out immediately so time-to-first-byte is unchanged;
+    later frames are held until the window since the first buffered frame
+    elapses, the batch reaches _COALESCE_MAX_BYTES, or the stream ends.
+    Frames are concatenated in order, so event boundaries are preserved.
+    """
+    loop = asyncio.get_running_loop()
+    buffer = bytearray()
+    deadline = 0.0
+    pending = None
+    try:
+        first = await anext(stream, None)
+        if first is None:
+            return
+        yield first
+
+        while True:
+            if pending is None:
+                # Keep one read in flight across flushes; cancelling it on a
+                # timeout would tear down the source generator
+                pending = asyncio.ensure_future(anext(stream))
+            timeout = max(deadline - loop.time(), 0.0) if buffer else None
+            done, _ = await asyncio.wait((pending,), timeout=timeout)
+            if not done:
+                yield bytes(buffer)
+                buffer.clear()
+                continue
+
+            read, pending = pending, None
+            try:
+                frame = read.result()
+            except StopAsyncIteration:
+                break
+            except Exception:
+                # Deliver what the source produced before it failed; not done
+                # for GeneratorExit/CancelledError, where yielding is invalid
+                if buffer:
+                    yield bytes(buffer)
+                raise
+            if not buffer:
+                deadline = loop.time() + window
+            buffer += frame
+            if len(buffer) >= _COALESCE_MAX_BYTES:
+                yield bytes(buffer)
+                buffer.clear()
+
+        if buffer:
+            yield bytes(buffer)
+    finally:
+        if pending is not None:
+            pending.cancel()
+            try:
+                await pending
+            except (asyncio.CancelledError, StopAsyncIteration):
+                pass
+        await stream.aclose()
+
+
+def _sse_response(stream: AsyncGenerator[bytes, None]) -> StreamingResponse:
+    """Wrap an async generator in an SSE StreamingResponse.
+
+    Starlette iterates sync generators through its threadpool, adding a thread
+    hop per event, so anything other than an async generator is rejected.
+    With SSE_COALESCE_MS set, frames arriving close together share a write.
+    """
+    if not isinstance(stream, AsyncGeneratorType):
+        raise TypeError("SSE streams must be async generators")
+    if config.sse_coalesce_ms > 0:
+        stream = _coalesce_frames(stream, config.sse_coalesce_ms / 1000)
+    return StreamingResponse(
+        stream, media_type="text/event-stream", headers=_SSE_HEADERS
+    )
+
+
+async def _cancel_on_disconnect(http_request: Request, request_id: str) -> None:
+    """Cancel the tracked upstream completion once the client goes away.
+
+    The request body has already been read, so the next ASGI message is the
+    server's http.disconnect; waiting on it costs no polling.
+    """
+    while (await http_request.receive())["type"] != "http.disconnect":
+        pass
+    logger.info("Client disconnected, cancelling request %s", request_id)
+    openai_client.cancel_request(request_id)
+
+
 async def validate_api_key(
     x_api_key: Optional[str] = Header(None), authorization: Optional[str] = Header(None)
 ):
@@ -49,7 +184,7 @@ async def validate_api_key(
     if x_api_key:
         client_api_key = x_api_key
     elif authorization and authorization.startswith("Bearer "):
-        client_api_key = authorization.replace("Bearer ", "")
+        client_api_key = authorization.removeprefix("Bearer ")
 
     # Skip validation if ANTHROPIC_API_KEY is not set in the environment
     if not config.anthropic_api_key:
@@ -64,6 +199,23 @@ async def validate_api_key(
         )
 
 
+# Upstream error bodies can be arbitrarily large; cap what goes into the log
+_MAX_LOGGED_ERROR_CHARS = 2048
+
+
+def _truncate_for_log(text: str) -> str:
+    """Bound the size of upstream payloads written to the log."""
+    if len(text) <= _MAX_LOGGED_ERROR_CHARS:
+        return text
+    omitted = len(text) - _MAX_LOGGED_ERROR_CHARS
+    return f"{text[:_MAX_LOGGED_ERROR_CHARS]}...<{omitted} more chars>"
+
+
+# Passthrough needs both an Anthropic key and the feature flag; neither
+# changes after startup, so decide once instead of per request
+_PASSTHROUGH_ENABLED = bool(config.anthropic_api_key and config.enable_passthrough)
+
+
 def _get_passthrough_api_key(http_request: Request) -> str:
     """Extract the API key from the request headers, falling back to config."""
     api_key = http_request.headers.get("x-api-key")
@@ -89,27 +241,32 @@ async def _handle_passthrough(
         "content-type": "application/json",
     }
 
-    body = request.model_dump(exclude_none=True)
+    # Serialize straight to JSON in pydantic-core instead of building an
+    # intermediate dict for httpx to re-encode
+    body = request.model_dump_json(exclude_none=True)
 
     logger.info(
-        f"Passthrough → Anthropic: model={request.model}, stream={request.stream}"
+        "Passthrough → Anthropic: model=%s, stream=%s", request.model, request.stream
     )
 
     try:
         if request.stream:
             # Streaming: keep the connection open and pipe SSE events back
-            client = httpx.AsyncClient(timeout=httpx.Timeout(config.request_timeout))
-            upstream = await client.send(
-                client.build_request("POST", url, json=body, headers=headers),
+            upstream = await passthrough_client.send(
+                passthrough_client.build_request(
+                    "POST", url, content=body, headers=headers
+                ),
                 stream=True,
             )
 
             if upstream.status_code != 200:
                 resp_body = await upstream.aread()
                 await upstream.aclose()
-                await client.aclose()
+                error_text = resp_body.decode()
                 logger.error(
-                    f"Passthrough upstream error {upstream.status_code}: {resp_body.decode()}"
+                    "Passthrough upstream error %s: %s",
+                    upstream.status_code,
+                    _truncate_for_log(error_text),
                 )
                 return JSONResponse(
                     status_code=upstream.status_code,
@@ -117,12 +274,12 @@ async def _handle_passthrough(
                         "type": "error",
                         "error": {
                             "type": "api_error",
-                            "message": resp_body.decode(),
+                            "message": error_text,
                         },
                     },
                 )
 
-            async def _streaming_generator() -> AsyncIterator[bytes]:
+            async def _streaming_generator() -> AsyncGenerator[bytes, None]:
                 try:
                     async for chunk in upstream.aiter_bytes():
                         yield chunk
@@ -130,28 +287,17 @@ async def _handle_passthrough(
                     pass
                 finally:
                     await upstream.aclose()
-                    await client.aclose()
-
-            return StreamingResponse(
-                _streaming_generator(),
-                media_type="text/event-stream",
-                headers={
-                    "Cache-Control": "no-cache",
-                    "Connection": "keep-alive",
-                    "Access-Control-Allow-Origin": "*",
-                    "Access-Control-Allow-Headers": "*",
-                },
-            )
+
+            return _sse_response(_streaming_generator())
         else:
             # Non-streaming: simple request/response
-            async with httpx.AsyncClient(
-                timeout=httpx.Timeout(config.request_timeout)
-            ) as client:
-                upstream = await client.post(url, json=body, headers=headers)
+            upstream = await passthrough_client.post(url, content=body, headers=headers)
 
             if upstream.status_code != 200:
                 logger.error(
-                    f"Passthrough upstream error {upstream.status_code}: {upstream.text}"
+                    "Passthrough upstream error %s: %s",
+                    upstream.status_code,
+                    _truncate_for_log(upstream.text),
                 )
                 return JSONResponse(
                     status_code=upstream.status_code,
@@ -166,7 +312,7 @@ async def _handle_passthrough(
             status_code=504, detail="Upstream Anthropic request timed out"
         )
     except httpx.HTTPError as exc:
-        logger.error(f"Passthrough HTTP error: {exc}")
+        logger.error("Passthrough HTTP error: %s", exc)
         raise HTTPException(status_code=502, detail=f"Upstream Anthropic error: {exc}")
 
 
@@ -180,15 +326,13 @@ async def create_message(
         start_time = time.monotonic()
 
         logger.debug(
-            f"Processing Claude request: model={request.model}, stream={request.stream}"
+            "Processing Claude request: model=%s, stream=%s",
+            request.model,
+            request.stream,
         )
 
         # Anthropic passthrough: forward Claude model requests directly to Anthropic API
-        if (
-            config.anthropic_api_key
-            and config.enable_passthrough
-            and "claude" in request.model.lower()
-        ):
+        if _PASSTHROUGH_ENABLED and request.is_claude_model:
             return await _handle_passthrough(request, http_request)
 
         # Generate unique request ID for cancellation tracking
@@ -205,43 +349,39 @@ async def create_message(
             # Streaming response - wrap in error handling
             try:
                 openai_stream = openai_client.create_chat_completion_stream(
-                    openai_request, request_id
+                    openai_request
                 )
-                return StreamingResponse(
+                return _sse_response(
                     convert_openai_streaming_to_claude_with_cancellation(
                         openai_stream,
                         request,
                         logger,
                         http_request,
-                        openai_client,
                         request_id,
                         start_time=start_time,
-                    ),
-                    media_type="text/event-stream",
-                    headers={
-                        "Cache-Control": "no-cache",
-                        "Connection": "keep-alive",
-                        "Access-Control-Allow-Origin": "*",
-                        "Access-Control-Allow-Headers": "*",
-                    },
+                        merge_window=config.sse_coalesce_ms / 1000,
+                    )
                 )
             except HTTPException as e:
                 # Convert to proper error response for streaming
-                logger.error(f"Streaming error: {e.detail}")
-                import traceback
-
-                logger.error(traceback.format_exc())
-                error_message = openai_client.classify_openai_error(e.detail)
+                logger.exception("Streaming error: %s", e.detail)
+                # The client already classified the error into e.detail
                 error_response = {
                     "type": "error",
-                    "error": {"type": "api_error", "message": error_message},
+                    "error": {"type": "api_error", "message": e.detail},
                 }
                 return JSONResponse(status_code=e.status_code, content=error_response)
         else:
-            # Non-streaming response
-            openai_response = await openai_client.create_chat_completion(
-                openai_request, request_id
+            # Non-streaming response; a disconnect cancels the upstream call
+            watcher = asyncio.create_task(
+                _cancel_on_disconnect(http_request, request_id)
             )
+            try:
+                openai_response = await openai_client.create_chat_completion(
+                    openai_request, request_id
+                )
+            finally:
+                watcher.cancel()
             claude_response = convert_openai_to_claude_response(
                 openai_response, request
             )
@@ -252,17 +392,25 @@ async def create_message(
             tok_s = output_tokens / elapsed if elapsed > 0 else 0
             model = request.model
             logger.info(
-                f"Request completed: model={model}, {output_tokens} tokens in {elapsed:.1f}s ({tok_s:.1f} tok/s)"
+                "Request completed: model=%s, %s tokens in %.1fs (%.1f tok/s)",
+                model,
+                output_tokens,
+                elapsed,
+                tok_s,
             )
 
-            return claude_response
+            # Already plain JSON-safe data: skip FastAPI's jsonable_encoder
+            # pass and serialize once with orjson
+            try:
+                content = orjson.dumps(claude_response)
+            except TypeError:
+                # Values orjson rejects (e.g. >64-bit ints in tool input)
+                return JSONResponse(content=claude_response)
+            return Response(content=content, media_type="application/json")
     except HTTPException:
         raise
     except Exception as e:
-        import traceback
-
-        logger.error(f"Unexpected error processing request: {e}")
-        logger.error(traceback.format_exc())
+        logger.exception("Unexpected error processing request: %s", e)
         error_message = openai_client.classify_openai_error(str(e))
         raise HTTPException(status_code=500, detail=error_message)
 
@@ -280,8 +428,9 @@ async def count_tokens(
                 total_text.append(request.system)
             elif isinstance(request.system, list):
                 for block in request.system:
-                    if hasattr(block, "text"):
-                        total_text.append(block.text)
+                    text = getattr(block, "text", None)
+                    if text is not None:
+                        total_text.append(text)
 
         # Collect message text
         for msg in request.messages:
@@ -291,8 +440,9 @@ async def count_tokens(
                 total_text.append(msg.content)
             elif isinstance(msg.content, list):
                 for block in msg.content:
-                    if hasattr(block, "text") and block.text is not None:
-                        total_text.append(block.text)
+                    text = getattr(block, "text", None)
+                    if text is not None:
+                        total_text.append(text)
 
         combined = "\n".join(total_text)
 
@@ -305,7 +455,7 @@ async def count_tokens(
         return {"input_tokens": max(1, estimated_tokens)}
 
     except Exception as e:
-        logger.error(f"Error counting tokens: {e}")
+        logger.error("Error counting tokens: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 
@@ -339,11 +489,11 @@ async def test_connection():
             "message": "Successfully connected to OpenAI API",
             "model_used": config.small_model,
             "timestamp": datetime.now().isoformat(),
-            "response_id": test_response.get("id", "unknown"),
+            "response_id": getattr(test_response, "id", None) or "unknown",
         }
 
     except Exception as e:
-        logger.error(f"API connectivity test failed: {e}")
+        logger.error("API connectivity test failed: %s", e)
         return JSONResponse(
             status_code=503,
             content={
@@ -1,13 +1,30 @@
 import json
 import logging
-from typing import Dict, Any, List
+import math
+from functools import lru_cache
+from typing import Dict, Any, List, Optional, Tuple
+
+import orjson
 
 from src.core.config import config
 from src.core.constants import Constants
-from src.models.claude import ClaudeMessagesRequest, ClaudeMessage
+from src.models.claude import ClaudeMessagesRequest, ClaudeMessage, ClaudeTool
 
 logger = logging.getLogger(__name__)
 
+# Hot-path aliases: plain module globals avoid a class attribute lookup per block
+_ROLE_USER = Constants.ROLE_USER
+_ROLE_ASSISTANT = Constants.ROLE_ASSISTANT
+_ROLE_SYSTEM = Constants.ROLE_SYSTEM
+_ROLE_TOOL = Constants.ROLE_TOOL
+_CONTENT_TEXT = Constants.CONTENT_TEXT
+_CONTENT_IMAGE = Constants.CONTENT_IMAGE
+_CONTENT_TOOL_USE = Constants.CONTENT_TOOL_USE
+_CONTENT_TOOL_RESULT = Constants.CONTENT_TOOL_RESULT
+_TOOL_FUNCTION = Constants.TOOL_FUNCTION
+_CLAUDE_ONLY_FIELDS = Constants.CLAUDE_ONLY_FIELDS
+_GEMINI_UNSUPPORTED_SCHEMA_FIELDS = Constants.GEMINI_UNSUPPORTED_SCHEMA_FIELDS
+
 
 def _clean_schema_for_gemini(schema: dict) -> dict:
     """Recursively remove JSON Schema fields unsupported by Google Gemini."""
@@ -16,7 +33,7 @@ def _clean_schema_for_gemini(schema: dict) -> dict:
 
     cleaned: Dict[str, Any] = {}
     for key, value in schema.items():
-        if key in Constants.GEMINI_UNSUPPORTED_SCHEMA_FIELDS:
+        if key in _GEMINI_UNSUPPORTED_SCHEMA_FIELDS:
             continue
 
         if key in ("properties", "patternProperties") and isinstance(value, dict):
@@ -61,53 +78,52 @@ def convert_claude_to_openai(
         elif isinstance(claude_request.system, list):
             text_parts = []
             for block in claude_request.system:
-                if hasattr(block, "type") and block.type == Constants.CONTENT_TEXT:
+                if getattr(block, "type", None) == _CONTENT_TEXT:
                     text_parts.append(block.text)
-                elif (
-                    isinstance(block, dict)
-                    and block.get("type") == Constants.CONTENT_TEXT
-                ):
+                elif isinstance(block, dict) and block.get("type") == _CONTENT_TEXT:
                     text_parts.append(block.get("text", ""))
             system_text = "\n\n".join(text_parts)
 
         if system_text.strip():
             openai_messages.append(
-                {"role": Constants.ROLE_SYSTEM, "content": system_text.strip()}
+                {"role": _ROLE_SYSTEM, "content": system_text.strip()}
             )
 
     # Process Claude messages
-    i = 0
-    while i < len(claude_request.messages):
-        msg = claude_request.messages[i]
-
-        if msg.role == Constants.ROLE_USER:
-            openai_message = convert_claude_user_message(msg)
-            openai_messages.append(openai_message)
-        elif msg.role == Constants.ROLE_ASSISTANT:
-            openai_message = convert_claude_assistant_message(msg)
-            openai_messages.append(openai_message)
-
-            # Check if next message contains tool results
-            if i + 1 < len(claude_request.messages):
-                next_msg = claude_request.messages[i + 1]
-                if (
-                    next_msg.role == Constants.ROLE_USER
-                    and isinstance(next_msg.content, list)
-                    and any(
-                        block.type == Constants.CONTENT_TOOL_RESULT
-                        for block in next_msg.content
-                        if hasattr(block, "type")
-                    )
-                ):
-                    # Process tool results
-                    i += 1  # Skip to tool result message
-                    tool_results = convert_claude_tool_results(next_msg)
-                    openai_messages.extend(tool_results)
-
-        i += 1
-
-    # Sanitize messages — strip Claude-only fields that other providers reject
-    sanitized_messages = _sanitize_messages(openai_messages)
+    messages = claude_request.messages
+    if all(type(msg.content) is str for msg in messages):
+        # Plain chat turns: no blocks to convert, no tool results to pair and
+        # no Claude-only fields to strip
+        openai_messages.extend(
+            {"role": msg.role, "content": msg.content} for msg in messages
+        )
+        sanitized_messages = openai_messages
+    else:
+        i = 0
+        while i < len(messages):
+            msg = messages[i]
+
+            if msg.role == _ROLE_USER:
+                openai_message = convert_claude_user_message(msg)
+                openai_messages.append(openai_message)
+            elif msg.role == _ROLE_ASSISTANT:
+                openai_message = convert_claude_assistant_message(msg)
+                openai_messages.append(openai_message)
+
+                # Check if next message contains tool results — converting in one
+                # pass doubles as the detection scan
+                if i + 1 < len(messages):
+                    next_msg = messages[i + 1]
+                    if next_msg.role == _ROLE_USER:
+                        tool_results = convert_claude_tool_results(next_msg)
+                        if tool_results:
+                            i += 1  # Skip the tool result message
+                            openai_messages.extend(tool_results)
+
+            i += 1
+
+        # Sanitize messages — strip Claude-only fields that other providers reject
+        sanitized_messages = _sanitize_messages(openai_messages)
 
     # Calculate token limit
     token_limit = min(
@@ -130,7 +146,7 @@ def convert_claude_to_openai(
         if claude_request.temperature is not None:
             openai_request["temperature"] = claude_request.temperature
 
-    logger.debug(f"Converted request: model={openai_model}, tokens={token_limit}")
+    logger.debug("Converted request: model=%s, tokens=%s", openai_model, token_limit)
 
     # Add optional parameters
     if claude_request.stop_sequences:
@@ -140,33 +156,8 @@ def convert_claude_to_openai(
 
     # Convert tools
     if claude_request.tools:
-        openai_tools = []
-        for tool in claude_request.tools:
-            if tool.name and tool.name.strip():
-                openai_tools.append(
-                    {
-                        "type": Constants.TOOL_FUNCTION,
-                        Constants.TOOL_FUNCTION: {
-                            "name": tool.name,
-                            "description": tool.description or "",
-                            "parameters": tool.input_schema,
-                        },
-                    }
-                )
+        openai_tools = convert_claude_tools(claude_request.tools)
         if openai_tools:
-            if config.is_gemini_provider():
-                openai_tools = [
-                    {
-                        **tool,
-                        Constants.TOOL_FUNCTION: {
-                            **tool[Constants.TOOL_FUNCTION],
-                            "parameters": _clean_schema_for_gemini(
-                                tool[Constants.TOOL_FUNCTION].get("parameters", {})
-                            ),
-                        },
-                    }
-                    for tool in openai_tools
-                ]
             openai_request["tools"] = openai_tools
 
     # Convert tool choice
@@ -177,50 +168,128 @@ def convert_claude_to_openai(
         elif choice_type == "any":
             openai_request["tool_choice"] = "required"
         elif choice_type == "tool" and "name" in claude_request.tool_choice:
-            openai_request["tool_choice"] = {
-                "type": Constants.TOOL_FUNCTION,
-                Constants.TOOL_FUNCTION: {"name": claude_request.tool_choice["name"]},
-            }
+            openai_request["tool_choice"] = _pinned_tool_choice(
+                claude_request.tool_choice["name"]
+            )
         else:
             openai_request["tool_choice"] = "auto"
 
     return openai_request
 
 
+def _convert_user_text_block(block) -> Dict[str, Any]:
+    return {"type": "text", "text": block.text}
+
+
+def _convert_user_image_block(block) -> Optional[Dict[str, Any]]:
+    """Convert Claude image format to OpenAI format (base64 sources only)."""
+    source = block.source
+    if (
+        isinstance(source, dict)
+        and source.get("type") == "base64"
+        and "media_type" in source
+        and "data" in source
+    ):
+        return {
+            "type": "image_url",
+            "image_url": {
+                "url": f"data:{source['media_type']};base64,{source['data']}"
+            },
+        }
+    return None
+
+
+# Block type -> converter for user message content; unknown types are dropped
+_USER_BLOCK_BUILDERS = {
+    _CONTENT_TEXT: _convert_user_text_block,
+    _CONTENT_IMAGE: _convert_user_image_block,
+}
+
+
+def convert_claude_tools(tools: List[ClaudeTool]) -> List[Dict[str, Any]]:
+    """Convert Claude tool definitions to OpenAI format.
+
+    Clients resend the same tool list every turn, so conversions are cached
+    by tool content. The returned list is shared and must not be mutated.
+    """
+    try:
+        tool_specs = tuple(
+            (tool.name, tool.description or "", orjson.dumps(tool.input_schema))
+            for tool in tools
+        )
+    except TypeError:
+        # Schema orjson can't encode (e.g. >64-bit ints): convert uncached
+        return _build_openai_tools(
+            [(tool.name, tool.description or "", tool.input_schema) for tool in tools],
+            config.is_gemini_provider(),
+        )
+    return _convert_claude_tools_cached(tool_specs, config.is_gemini_provider())
+
+
+@lru_cache(maxsize=128)
+def _convert_claude_tools_cached(
+    tool_specs: Tuple[Tuple[str, str, bytes], ...], gemini: bool
+) -> List[Dict[str, Any]]:
+    # Decode a private copy of each schema so cached entries never alias
+    # request objects
+    return _build_openai_tools(
+        [(name, desc, orjson.loads(schema)) for name, desc, schema in tool_specs],
+        gemini,
+    )
+
+
+def _build_openai_tools(
+    tool_specs: List[Tuple[str, str, Dict[str, Any]]], gemini: bool
+) -> List[Dict[str, Any]]:
+    openai_tools = []
+    for name, description, schema in tool_specs:
+        if name and name.strip():
+            if gemini:
+                schema = _clean_schema_for_gemini(schema)
+            openai_tools.append(
+                {
+                    "type": _TOOL_FUNCTION,
+                    _TOOL_FUNCTION: {
+                        "name": name,
+                        "description": description,
+                        "parameters": schema,
+                    },
+                }
+            )
+    return openai_tools
+
+
+@lru_cache(maxsize=64)
+def _pinned_tool_choice(name: str) -> Dict[str, Any]:
+    """OpenAI tool_choice forcing a specific tool; shared, treat as read-only."""
+    return {"type": _TOOL_FUNCTION, _TOOL_FUNCTION: {"name": name}}
+
+
 def convert_claude_user_message(msg: ClaudeMessage) -> Dict[str, Any]:
     """Convert Claude user message to OpenAI format."""
     if msg.content is None:
-        return {"role": Constants.ROLE_USER, "content": ""}
+        return {"role": _ROLE_USER, "content": ""}
 
     if isinstance(msg.content, str):
-        return {"role": Constants.ROLE_USER, "content": msg.content}
+        return {"role": _ROLE_USER, "content": msg.content}
+
+    # Common single-text-block shape: same result as the loop below
+    if len(msg.content) == 1 and msg.content[0].type == _CONTENT_TEXT:
+        return {"role": _ROLE_USER, "content": msg.content[0].text}
 
     # Handle multimodal content
     openai_content = []
     for block in msg.content:
-        if block.type == Constants.CONTENT_TEXT:
-            openai_content.append({"type": "text", "text": block.text})
-        elif block.type == Constants.CONTENT_IMAGE:
-            # Convert Claude image format to OpenAI format
-            if (
-                isinstance(block.source, dict)
-                and block.source.get("type") == "base64"
-                and "media_type" in block.source
-                and "data" in block.source
-            ):
-                openai_content.append(
-                    {
-                        "type": "image_url",
-                        "image_url": {
-                            "url": f"data:{block.source['media_type']};base64,{block.source['data']}"
-                        },
-                    }
-                )
+        builder = _USER_BLOCK_BUILDERS.get(block.type)
+        if builder is not None:
+            converted = builder(block)
+            if converted is not None:
+                openai_content.append(converted)
 
     if len(openai_content) == 1 and openai_content[0]["type"] == "text":
-        return {"role": Constants.ROLE_USER, "content": openai_content[0]["text"]}
+        return {"role": _ROLE_USER, "content": openai_content[0]["text"]}
     else:
-        return {"role": Constants.ROLE_USER, "content": openai_content}
+        return {"role": _ROLE_USER, "content": openai_content}
 
 
 def convert_claude_assistant_message(msg: ClaudeMessage) -> Dict[str, Any]:
@@ -229,30 +298,30 @@ def convert_claude_assistant_message(msg: ClaudeMessage) -> Dict[str, Any]:
     tool_calls = []
 
     if msg.content is None:
-        return {"role": Constants.ROLE_ASSISTANT, "content": None}
+        return {"role": _ROLE_ASSISTANT, "content": None}
 
     if isinstance(msg.content, str):
-        return {"role": Constants.ROLE_ASSISTANT, "content": msg.content}
+        return {"role": _ROLE_ASSISTANT, "content": msg.content}
 
     for block in msg.content:
-        # Skip thinking/cache_control blocks — non-Claude providers reject them
-        if hasattr(block, "type") and block.type in Constants.CLAUDE_ONLY_FIELDS:
-            continue
-        if block.type == Constants.CONTENT_TEXT:
+        # Only text and tool_use carry over; thinking and other Claude-only
+        # blocks fall through both branches, as non-Claude providers reject them
+        block_type = getattr(block, "type", None)
+        if block_type == _CONTENT_TEXT:
             text_parts.append(block.text)
-        elif block.type == Constants.CONTENT_TOOL_USE:
+        elif block_type == _CONTENT_TOOL_USE:
             tool_calls.append(
                 {
                     "id": block.id,
-                    "type": Constants.TOOL_FUNCTION,
-                    Constants.TOOL_FUNCTION: {
+                    "type": _TOOL_FUNCTION,
+                    _TOOL_FUNCTION: {
                         "name": block.name,
-                        "arguments": json.dumps(block.input, ensure_ascii=False),
+                        "arguments": _dumps(block.input),
                     },
                 }
             )
 
-    openai_message = {"role": Constants.ROLE_ASSISTANT}
+    openai_message = {"role": _ROLE_ASSISTANT}
 
     # Set content
     if text_parts:
@@ -273,11 +342,11 @@ def convert_claude_tool_results(msg: ClaudeMessage) -> List[Dict[str, Any]]:
 
     if isinstance(msg.content, list):
         for block in msg.content:
-            if block.type == Constants.CONTENT_TOOL_RESULT:
+            if block.type == _CONTENT_TOOL_RESULT:
                 content = parse_tool_result_content(block.content)
                 tool_messages.append(
                     {
-                        "role": Constants.ROLE_TOOL,
+                        "role": _ROLE_TOOL,
                         "tool_call_id": block.tool_use_id,
                         "content": content,
                     }
@@ -286,7 +355,37 @@ def convert_claude_tool_results(msg: ClaudeMessage) -> List[Dict[str, Any]]:
     return tool_messages
 
 
-def parse_tool_result_content(content):
+def _has_non_finite(obj: Any) -> bool:
+    """Whether obj holds a NaN or infinite float anywhere."""
+    if isinstance(obj, float):
+        return not math.isfinite(obj)
+    if isinstance(obj, dict):
+        return any(_has_non_finite(value) for value in obj.values())
+    if isinstance(obj, (list, tuple)):
+        return any(_has_non_finite(item) for item in obj)
+    return False
+
+
+def _json_dumps(obj: Any) -> str:
+    """Stdlib encoder with the same compact output orjson produces."""
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":"))
+
+
+def _dumps(obj: Any) -> str:
+    """Serialize tool input/output as compact JSON."""
+    try:
+        encoded = orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS)
+    except TypeError:
+        # Values orjson rejects (e.g. >64-bit ints)
+        return _json_dumps(obj)
+    # orjson writes NaN/Infinity as null, so only output containing null
+    # can have lost one; json keeps them as NaN/Infinity
+    if b"null" in encoded and _has_non_finite(obj):
+        return _json_dumps(obj)
+    return encoded.decode()
+
+
+def parse_tool_result_content(content: Any) -> str:
     """Parse and normalize tool result content into a string format."""
     if content is None:
         return "No content provided"
@@ -295,9 +394,9 @@ def parse_tool_result_content(content):
         return content
 
     if isinstance(content, list):
-        result_parts = []
+        result_parts: List[str] = []
         for item in content:
-            if isinstance(item, dict) and item.get("type") == Constants.CONTENT_TEXT:
+            if isinstance(item, dict) and item.get("type") == _CONTENT_TEXT:
                 result_parts.append(item.get("text", ""))
             elif isinstance(item, str):
                 result_parts.append(item)
@@ -306,23 +405,20 @@ def parse_tool_result_content(content):
                     result_parts.append(item.get("text", ""))
                 else:
                     try:
-                        result_parts.append(json.dumps(item, ensure_ascii=False))
+                        result_parts.append(_dumps(item))
                     except (TypeError, ValueError):
                         result_parts.append(str(item))
         return "\n".join(result_parts).strip()
 
     if isinstance(content, dict):
-        if content.get("type") == Constants.CONTENT_TEXT:
+        if content.get("type") == _CONTENT_TEXT:
             return content.get("text", "")
         try:
-            return json.dumps(content, ensure_ascii=False)
+            return _dumps(content)
         except (TypeError, ValueError):
             return str(content)
 
-    try:
-        return str(content)
-    except (TypeError, ValueError):
-        return "Unparseable content"
+    return str(content)
 
 
 def _sanitize_messages(messages: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
@@ -333,15 +429,10 @@ def _sanitize_messages(messages: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         # Remove cache_control from content blocks
         if isinstance(clean.get("content"), list):
             clean["content"] = [
-                {
-                    k: v
-                    for k, v in block.items()
-                    if k not in Constants.CLAUDE_ONLY_FIELDS
-                }
+                {k: v for k, v in block.items() if k not in _CLAUDE_ONLY_FIELDS}
                 for block in clean["content"]
                 if not (
-                    isinstance(block, dict)
-                    and block.get("type") in Constants.CLAUDE_ONLY_FIELDS
+                    isinstance(block, dict) and block.get("type") in _CLAUDE_ONLY_FIELDS
                 )
             ]
         sanitized.append(clean)
@@ -1,15 +1,87 @@
+import asyncio
 import json
 import logging
+import os
 import time
-import uuid
+from functools import lru_cache, singledispatch
+from typing import Any, AsyncGenerator, Callable
+
+import orjson
 
 from fastapi import HTTPException, Request
+from openai.types.chat import ChatCompletion, ChatCompletionChunk
 
 from src.core.constants import Constants
 from src.models.claude import ClaudeMessagesRequest
 
 logger = logging.getLogger(__name__)
 
+# Hot-path aliases: plain module globals avoid a class attribute lookup per chunk
+_ROLE_ASSISTANT = Constants.ROLE_ASSISTANT
+_CONTENT_TEXT = Constants.CONTENT_TEXT
+_CONTENT_THINKING = Constants.CONTENT_THINKING
+_CONTENT_TOOL_USE = Constants.CONTENT_TOOL_USE
+_TOOL_FUNCTION = Constants.TOOL_FUNCTION
+_STOP_END_TURN = Constants.STOP_END_TURN
+_STOP_MAX_TOKENS = Constants.STOP_MAX_TOKENS
+_STOP_TOOL_USE = Constants.STOP_TOOL_USE
+_EVENT_MESSAGE_START = Constants.EVENT_MESSAGE_START
+_EVENT_MESSAGE_STOP = Constants.EVENT_MESSAGE_STOP
+_EVENT_MESSAGE_DELTA = Constants.EVENT_MESSAGE_DELTA
+_EVENT_CONTENT_BLOCK_START = Constants.EVENT_CONTENT_BLOCK_START
+_EVENT_CONTENT_BLOCK_STOP = Constants.EVENT_CONTENT_BLOCK_STOP
+_EVENT_CONTENT_BLOCK_DELTA = Constants.EVENT_CONTENT_BLOCK_DELTA
+_EVENT_PING = Constants.EVENT_PING
+_DELTA_TEXT = Constants.DELTA_TEXT
+_DELTA_INPUT_JSON = Constants.DELTA_INPUT_JSON
+_DELTA_THINKING = Constants.DELTA_THINKING
+
+# OpenAI finish_reason -> Claude stop_reason; anything else is end_turn
+_STOP_REASON_MAP: dict[str | None, str] = {
+    "stop": _STOP_END_TURN,
+    "length": _STOP_MAX_TOKENS,
+    "tool_calls": _STOP_TOOL_USE,
+    "function_call": _STOP_TOOL_USE,
+}
+
+# Pre-encoded "event: <name>\ndata: " prefixes for every SSE frame we emit
+_SSE_PREFIXES = {
+    name: b"event: " + name.encode() + b"\ndata: "
+    for name in (
+        _EVENT_MESSAGE_START,
+        _EVENT_MESSAGE_STOP,
+        _EVENT_MESSAGE_DELTA,
+        _EVENT_CONTENT_BLOCK_START,
+        _EVENT_CONTENT_BLOCK_STOP,
+        _EVENT_CONTENT_BLOCK_DELTA,
+        _EVENT_PING,
+        "error",
+    )
+}
+
+
+def _sse_event(event: str, payload: dict) -> bytes:
+    """Encode one Claude SSE frame."""
+    return _SSE_PREFIXES[event] + orjson.dumps(payload) + b"\n\n"
+
+
+# Frames with no per-stream content
+_TEXT_BLOCK_START_FRAME = _sse_event(
+    _EVENT_CONTENT_BLOCK_START,
+    {
+        "type": _EVENT_CONTENT_BLOCK_START,
+        "index": 0,
+        "content_block": {"type": _CONTENT_TEXT, "text": ""},
+    },
+)
+_PING_FRAME = _sse_event(_EVENT_PING, {"type": _EVENT_PING})
+_MESSAGE_STOP_FRAME = _sse_event(_EVENT_MESSAGE_STOP, {"type": _EVENT_MESSAGE_STOP})
+
+
+def _new_id(prefix: str) -> str:
+    """Random Claude-style id: prefix plus 24 hex chars."""
+    return f"{prefix}_{os.urandom(12).hex()}"
+
 
 def _extract_reasoning_details(details: list) -> str:
     """Extract reasoning text from OpenRouter's reasoning_details array format."""
@@ -24,11 +96,38 @@ def _extract_reasoning_details(details: list) -> str:
     return "".join(parts)
 
 
+def _tool_call_fields(tool_call: dict) -> tuple[str | None, str | None, Any]:
+    """Read (id, name, arguments) from an OpenAI tool call or tool call delta.
+
+    Missing fields come back as None; callers apply their own defaults.
+    arguments is normally a JSON string but some providers send a dict.
+    """
+    function_data = tool_call.get(_TOOL_FUNCTION) or {}
+    return (
+        tool_call.get("id"),
+        function_data.get("name"),
+        function_data.get("arguments"),
+    )
+
+
+@singledispatch
 def convert_openai_to_claude_response(
-    openai_response: dict, original_request: ClaudeMessagesRequest
+    openai_response, original_request: ClaudeMessagesRequest
 ) -> dict:
-    """Convert OpenAI response to Claude format."""
+    """Convert OpenAI response to Claude format.
+
+    Dispatches on the response type: plain dicts and the SDK's ChatCompletion
+    are read directly; any other pydantic model is dumped to a dict first.
+    """
+    return convert_openai_to_claude_response(
+        openai_response.model_dump(), original_request
+    )
 
+
+@convert_openai_to_claude_response.register(dict)
+def _convert_response_dict(
+    openai_response: dict, original_request: ClaudeMessagesRequest
+) -> dict:
     # Extract response data
     choices = openai_response.get("choices", [])
     if not choices:
@@ -37,10 +136,7 @@ def convert_openai_to_claude_response(
     choice = choices[0]
     message = choice.get("message", {})
 
-    # Build Claude content blocks
-    content_blocks = []
-
-    # Add reasoning/thinking content if present (o1/o3/o4 models)
+    # Reasoning/thinking content (o1/o3/o4 models)
     reasoning = message.get("reasoning_content") or message.get("reasoning")
 
     # Also check OpenRouter's reasoning_details array format
@@ -49,463 +145,632 @@ def convert_openai_to_claude_response(
         if isinstance(reasoning_details, list) and reasoning_details:
             reasoning = _extract_reasoning_details(reasoning_details)
 
+    tool_calls = [
+        _tool_call_fields(tool_call)
+        for tool_call in message.get("tool_calls", []) or []
+        if tool_call.get("type") == _TOOL_FUNCTION
+    ]
+
+    usage = openai_response.get("usage") or {}
+    return _build_claude_response(
+        original_request,
+        openai_response.get("id"),
+        reasoning,
+        message.get("content"),
+        tool_calls,
+        choice.get("finish_reason", "stop"),
+        usage.get("prompt_tokens", 0),
+        usage.get("completion_tokens", 0),
+    )
+
+
+@convert_openai_to_claude_response.register(ChatCompletion)
+def _convert_chat_completion(
+    openai_response: ChatCompletion, original_request: ClaudeMessagesRequest
+) -> dict:
+    # The SDK builds responses without validation, so OpenAI-compatible
+    # providers can leave fields unset; read directly and fall back to the
+    # dict path only when that happens
+    try:
+        choices = openai_response.choices
+        if not choices:
+            raise HTTPException(status_code=500, detail="No choices in OpenAI response")
+        choice = choices[0]
+        message = choice.message
+        response_id = openai_response.id
+        text_content = message.content
+        finish_reason = choice.finish_reason
+        tool_calls: list[tuple[str | None, str | None, Any]] = [
+            (tool_call.id, tool_call.function.name, tool_call.function.arguments)
+            for tool_call in message.tool_calls or []
+            if tool_call.type == "function"
+        ]
+        usage = openai_response.usage
+    except AttributeError:
+        return _convert_response_dict(openai_response.model_dump(), original_request)
+
+    # Provider-specific reasoning fields arrive as pydantic extras
+    reasoning = getattr(message, "reasoning_content", None) or getattr(
+        message, "reasoning", None
+    )
+    if not reasoning:
+        reasoning_details = getattr(message, "reasoning_details", None)
+        if isinstance(reasoning_details, list) and reasoning_details:
+            reasoning = _extract_reasoning_details(reasoning_details)
+
+    return _build_claude_response(
+        original_request,
+        response_id,
+        reasoning,
+        text_content,
+        tool_calls,
+        finish_reason,
+        usage.prompt_tokens if usage else 0,
+        usage.completion_tokens if usage else 0,
+    )
+
+
+def _build_claude_response(
+    original_request: ClaudeMessagesRequest,
+    response_id: str | None,
+    reasoning: Any,
+    text_content: str | None,
+    tool_calls: list[tuple[str | None, str | None, Any]],
+    finish_reason: str | None,
+    input_tokens: int,
+    output_tokens: int,
+) -> dict:
+    """Assemble a Claude message from fields already read off the response."""
+
+    # Build Claude content blocks
+    content_blocks: list[dict[str, Any]] = []
+
     if reasoning:
         content_blocks.append(
             {
-                "type": Constants.CONTENT_THINKING,
+                "type": _CONTENT_THINKING,
                 "thinking": reasoning if isinstance(reasoning, str) else str(reasoning),
             }
         )
 
     # Add text content
-    text_content = message.get("content")
     if text_content is not None:
-        content_blocks.append({"type": Constants.CONTENT_TEXT, "text": text_content})
+        content_blocks.append({"type": _CONTENT_TEXT, "text": text_content})
 
     # Add tool calls
-    tool_calls = message.get("tool_calls", []) or []
-    for tool_call in tool_calls:
-        if tool_call.get("type") == Constants.TOOL_FUNCTION:
-            function_data = tool_call.get(Constants.TOOL_FUNCTION, {})
+    for tool_id, name, raw_arguments in tool_calls:
+        if isinstance(raw_arguments, dict):
+            # Some OpenAI-compatible providers send arguments pre-parsed
+            arguments = raw_arguments
+        else:
+            if raw_arguments is None:
+                raw_arguments = "{}"
             try:
-                arguments = json.loads(function_data.get("arguments", "{}"))
+                # json, not orjson: orjson turns integers wider than 64 bits
+                # into floats, silently losing precision
+                arguments = json.loads(raw_arguments)
             except json.JSONDecodeError:
-                arguments = {"raw_arguments": function_data.get("arguments", "")}
+                arguments = {"raw_arguments": raw_arguments}
 
-            content_blocks.append(
-                {
-                    "type": Constants.CONTENT_TOOL_USE,
-                    "id": tool_call.get("id", f"tool_{uuid.uuid4()}"),
-                    "name": function_data.get("name", ""),
-                    "input": arguments,
-                }
-            )
+        content_blocks.append(
+            {
+                "type": _CONTENT_TOOL_USE,
+                "id": tool_id or _new_id("tool"),
+                "name": name or "",
+                "input": arguments,
+            }
+        )
 
     # Ensure at least one content block
     if not content_blocks:
-        content_blocks.append({"type": Constants.CONTENT_TEXT, "text": ""})
+        content_blocks.append({"type": _CONTENT_TEXT, "text": ""})
 
     # Map finish reason
-    finish_reason = choice.get("finish_reason", "stop")
-    stop_reason = {
-        "stop": Constants.STOP_END_TURN,
-        "length": Constants.STOP_MAX_TOKENS,
-        "tool_calls": Constants.STOP_TOOL_USE,
-        "function_call": Constants.STOP_TOOL_USE,
-    }.get(finish_reason, Constants.STOP_END_TURN)
+    stop_reason = _STOP_REASON_MAP.get(finish_reason, _STOP_END_TURN)
 
     # Build Claude response
     claude_response = {
-        "id": openai_response.get("id", f"msg_{uuid.uuid4()}"),
+        # Only draw a random id when the provider didn't send one
+        "id": response_id or _new_id("msg"),
         "type": "message",
-        "role": Constants.ROLE_ASSISTANT,
+        "role": _ROLE_ASSISTANT,
         "model": original_request.model,
         "content": content_blocks,
         "stop_reason": stop_reason,
         "stop_sequence": None,
         "usage": {
-            "input_tokens": openai_response.get("usage", {}).get("prompt_tokens", 0),
-            "output_tokens": openai_response.get("usage", {}).get(
-                "completion_tokens", 0
-            ),
+            "input_tokens": input_tokens,
+            "output_tokens": output_tokens,
         },
     }
 
     return claude_response
 
 
-def _handle_streaming_reasoning(
-    delta, has_thinking, thinking_block_index, text_block_index
-):
-    """Handle reasoning/thinking deltas from streaming chunks. Returns (events, reasoning_text, has_thinking, thinking_block_index, text_block_index)."""
-    events = []
+def _extract_chunk(
+    chunk: ChatCompletionChunk,
+) -> tuple[dict | None, dict | None, str | None]:
+    """Read (usage, delta, finish_reason) from one OpenAI stream chunk.
+
+    usage is already in Claude's shape, or None if the chunk carries none;
+    delta is None for chunks without choices (e.g. the trailing usage chunk).
+    SDK chunks are read by attribute and only their delta is dumped, keeping
+    just the fields the provider actually sent. Plain dict chunks go through
+    _extract_chunk_dict; the stream picks one reader from its first chunk.
+    """
+    usage = chunk.usage
+    claude_usage = None
+    if usage:
+        prompt_tokens_details = usage.prompt_tokens_details
+        claude_usage = {
+            "input_tokens": usage.prompt_tokens or 0,
+            "output_tokens": usage.completion_tokens or 0,
+            "cache_read_input_tokens": (
+                getattr(prompt_tokens_details, "cached_tokens", None) or 0
+            ),
+        }
+
+    choices = chunk.choices
+    if not choices:
+        return claude_usage, None, None
+    choice = choices[0]
+    delta = choice.delta
+    delta_fields = delta.model_dump(exclude_unset=True) if delta is not None else {}
+    return claude_usage, delta_fields, choice.finish_reason
+
+
+def _extract_chunk_dict(chunk: dict) -> tuple[dict | None, dict | None, str | None]:
+    usage = chunk.get("usage")
+    claude_usage = None
+    if usage:
+        prompt_tokens_details = usage.get("prompt_tokens_details") or {}
+        claude_usage = {
+            "input_tokens": usage.get("prompt_tokens", 0),
+            "output_tokens": usage.get("completion_tokens", 0),
+            "cache_read_input_tokens": prompt_tokens_details.get("cached_tokens", 0),
+        }
+
+    choices = chunk.get("choices")
+    if not choices:
+        return claude_usage, None, None
+    choice = choices[0]
+    return claude_usage, choice.get("delta", {}), choice.get("finish_reason")
+
+
+def _chunk_reader(
+    chunk: Any,
+) -> Callable[[Any], tuple[dict | None, dict | None, str | None]]:
+    """Reader for the shape of chunk; a stream keeps one shape throughout."""
+    return _extract_chunk_dict if isinstance(chunk, dict) else _extract_chunk
+
+
+def _streaming_reasoning(delta: dict) -> str | None:
+    """Reasoning text carried by a stream delta (o1/o3/o4 models + OpenRouter)."""
     reasoning = delta.get("reasoning_content") or delta.get("reasoning")
 
     # Check OpenRouter's reasoning_details array in delta
     if not reasoning:
         reasoning_details = delta.get("reasoning_details")
         if isinstance(reasoning_details, list):
-            parts = []
-            for item in reasoning_details:
-                if (
-                    isinstance(item, dict)
-                    and item.get("type") == "reasoning"
-                    and item.get("text")
-                ):
-                    parts.append(item["text"])
-            if parts:
-                reasoning = "".join(parts)
+            reasoning = _extract_reasoning_details(reasoning_details)
 
-    if reasoning:
-        if not has_thinking:
-            has_thinking = True
-            thinking_block_index = 0
-            text_block_index = 1
-            # Re-emit block 0 as thinking instead of text
-            events.append(
-                f"event: {Constants.EVENT_CONTENT_BLOCK_STOP}\ndata: {json.dumps({'type': Constants.EVENT_CONTENT_BLOCK_STOP, 'index': 0}, ensure_ascii=False)}\n\n"
+    return reasoning or None
+
+
+# Per streamed block type: (content_block for content_block_start, delta type,
+# delta field). Text and thinking share one code path through this table.
+_STREAMED_BLOCK_KINDS = {
+    _CONTENT_TEXT: (
+        {"type": _CONTENT_TEXT, "text": ""},
+        _DELTA_TEXT,
+        "text",
+    ),
+    _CONTENT_THINKING: (
+        {"type": _CONTENT_THINKING, "thinking": ""},
+        _DELTA_THINKING,
+        "thinking",
+    ),
+}
+
+
+# Flush merged text/thinking deltas once they reach this many characters
+_MERGE_MAX_CHARS = 256
+
+
+class _ContentBlocks:
+    """Track Claude content block indices while converting a stream.
+
+    At most one text/thinking block is open at a time; switching kind or
+    starting a tool closes it first. Tool blocks stay open until the end of
+    the stream because their argument deltas may keep arriving. Blocks are
+    opened by their first non-empty delta, so an index is never reused once
+    stopped; a stream with no content ends with one empty text block.
+
+    With a merge_window (seconds), deltas after the first one of a block are
+    held and sent as one delta once the window since the first held delta
+    has passed, _MERGE_MAX_CHARS is reached, or the block is closed. The
+    stream reads through _read_until_deadline so the window also expires
+    while upstream is silent.
+    """
+
+    def __init__(self, merge_window: float = 0.0) -> None:
+        self.open_kind: str | None = None
+        self.open_index = 0
+        self.next_index = 0
+        self.tool_indices: list[int] = []
+        self.merge_window = merge_window
+        self.pending: list[str] = []
+        self.pending_chars = 0
+        self.pending_since = 0.0
+
+    def delta(self, kind: str, text: str) -> list[bytes]:
+        """Frames for a text/thinking delta, switching blocks if needed."""
+        if not text:
+            # Empty deltas (e.g. content "" next to reasoning_content) carry
+            # nothing and must not switch blocks
+            return []
+        content_block, delta_type, field = _STREAMED_BLOCK_KINDS[kind]
+        frames = []
+        if self.open_kind != kind:
+            frames.extend(self.close_open())
+            index = self.next_index
+            self.next_index += 1
+            frames.append(
+                _sse_event(
+                    _EVENT_CONTENT_BLOCK_START,
+                    {
+                        "type": _EVENT_CONTENT_BLOCK_START,
+                        "index": index,
+                        "content_block": content_block,
+                    },
+                )
             )
-            events.append(
-                f"event: {Constants.EVENT_CONTENT_BLOCK_START}\ndata: {json.dumps({'type': Constants.EVENT_CONTENT_BLOCK_START, 'index': thinking_block_index, 'content_block': {'type': Constants.CONTENT_THINKING, 'thinking': ''}}, ensure_ascii=False)}\n\n"
+            self.open_kind = kind
+            self.open_index = index
+            # The first delta of a block is never held back
+            frames.append(_delta_frame(index, delta_type, field, text))
+            return frames
+
+        if not self.merge_window:
+            frames.append(_delta_frame(self.open_index, delta_type, field, text))
+            return frames
+
+        now = time.monotonic()
+        if not self.pending:
+            self.pending_since = now
+        self.pending.append(text)
+        self.pending_chars += len(text)
+        if (
+            self.pending_chars >= _MERGE_MAX_CHARS
+            or now - self.pending_since >= self.merge_window
+        ):
+            frames.extend(self.flush())
+        return frames
+
+    def flush_deadline(self) -> float | None:
+        """time.monotonic() by which held deltas must be flushed, if any."""
+        if not self.pending:
+            return None
+        return self.pending_since + self.merge_window
+
+    def flush(self) -> list[bytes]:
+        """Frame for the deltas held for the open block, if any."""
+        if not self.pending or self.open_kind is None:
+            return []
+        _, delta_type, field = _STREAMED_BLOCK_KINDS[self.open_kind]
+        text = "".join(self.pending)
+        self.pending = []
+        self.pending_chars = 0
+        return [_delta_frame(self.open_index, delta_type, field, text)]
+
+    def start_tool(self, tool_id: str, name: str) -> tuple[int, list[bytes]]:
+        """Allocate an index for a tool_use block; returns (index, frames)."""
+        frames = self.close_open()
+        index = self.next_index
+        self.next_index += 1
+        self.tool_indices.append(index)
+        frames.append(
+            _sse_event(
+                _EVENT_CONTENT_BLOCK_START,
+                {
+                    "type": _EVENT_CONTENT_BLOCK_START,
+                    "index": index,
+                    "content_block": {
+                        "type": _CONTENT_TOOL_USE,
+                        "id": tool_id,
+                        "name": name,
+                        "input": {},
+                    },
+                },
             )
-        events.append(
-            f"event: {Constants.EVENT_CONTENT_BLOCK_DELTA}\ndata: {json.dumps({'type': Constants.EVENT_CONTENT_BLOCK_DELTA, 'index': thinking_block_index, 'delta': {'type': Constants.DELTA_THINKING, 'thinking': reasoning}}, ensure_ascii=False)}\n\n"
         )
+        return index, frames
+
+    def close_open(self) -> list[bytes]:
+        """Frames closing the open text/thinking block, if any."""
+        if self.open_kind is None:
+            return []
+        frames = self.flush()
+        self.open_kind = None
+        frames.append(_block_stop_frame(self.open_index))
+        return frames
+
+    def close_all(self) -> list[bytes]:
+        """Frames closing every block still open at the end of the stream."""
+        if not self.next_index:
+            # Nothing was streamed: send one empty text block, as the
+            # non-streaming path does
+            self.next_index = 1
+            return [_TEXT_BLOCK_START_FRAME, _block_stop_frame(0)]
+        frames = self.close_open()
+        frames.extend(_block_stop_frame(index) for index in self.tool_indices)
+        self.tool_indices = []
+        return frames
+
+
+@lru_cache(maxsize=256)
+def _block_stop_frame(index: int) -> bytes:
+    return _sse_event(
+        _EVENT_CONTENT_BLOCK_STOP,
+        {"type": _EVENT_CONTENT_BLOCK_STOP, "index": index},
+    )
+
+
+@lru_cache(maxsize=256)
+def _delta_frame_template(
+    index: int, delta_type: str, field: str
+) -> tuple[bytes, bytes]:
+    """content_block_delta frame split around its value: (head, tail).
+
+    Only the delta value changes from token to token, so the rest of the
+    frame is encoded once per (index, delta type) and reused.
+    """
+    frame = _sse_event(
+        _EVENT_CONTENT_BLOCK_DELTA,
+        {
+            "type": _EVENT_CONTENT_BLOCK_DELTA,
+            "index": index,
+            "delta": {"type": delta_type, field: None},
+        },
+    )
+    head, tail = frame.rsplit(b"null", 1)
+    return head, tail
 
-    return events, has_thinking, thinking_block_index, text_block_index
-
-
-async def convert_openai_streaming_to_claude(
-    openai_stream, original_request: ClaudeMessagesRequest, logger
-):
-    """Convert OpenAI streaming response to Claude streaming format."""
-
-    message_id = f"msg_{uuid.uuid4().hex[:24]}"
-
-    # Send initial SSE events
-    yield f"event: {Constants.EVENT_MESSAGE_START}\ndata: {json.dumps({'type': Constants.EVENT_MESSAGE_START, 'message': {'id': message_id, 'type': 'message', 'role': Constants.ROLE_ASSISTANT, 'model': original_request.model, 'content': [], 'stop_reason': None, 'stop_sequence': None, 'usage': {'input_tokens': 0, 'output_tokens': 0}}}, ensure_ascii=False)}\n\n"
 
-    yield f"event: {Constants.EVENT_CONTENT_BLOCK_START}\ndata: {json.dumps({'type': Constants.EVENT_CONTENT_BLOCK_START, 'index': 0, 'content_block': {'type': Constants.CONTENT_TEXT, 'text': ''}}, ensure_ascii=False)}\n\n"
+def _delta_frame(index: int, delta_type: str, field: str, value: str) -> bytes:
+    head, tail = _delta_frame_template(index, delta_type, field)
+    return head + orjson.dumps(value) + tail
 
-    yield f"event: {Constants.EVENT_PING}\ndata: {json.dumps({'type': Constants.EVENT_PING}, ensure_ascii=False)}\n\n"
 
-    # Process streaming chunks
-    text_block_index = 0
-    thinking_block_index = -1  # -1 means no thinking block yet
-    tool_block_counter = 0
-    current_tool_calls = {}
-    final_stop_reason = Constants.STOP_END_TURN
-    has_thinking = False
+async def _read_until_deadline(
+    stream: AsyncGenerator[Any, None], deadline: Callable[[], float | None]
+) -> AsyncGenerator[Any, None]:
+    """Yield items from stream, or None each time deadline() passes first.
 
+    deadline() returns a time.monotonic() value, or None to wait
+    indefinitely. One read stays in flight across timeouts, since cancelling
+    it would tear down the source generator. Closing this closes the source.
+    """
+    pending: asyncio.Future | None = None
     try:
-        async for line in openai_stream:
-            if line.strip():
-                if line.startswith("data: "):
-                    chunk_data = line[6:]
-                    if chunk_data.strip() == "[DONE]":
-                        break
-
-                    try:
-                        chunk = json.loads(chunk_data)
-                        choices = chunk.get("choices", [])
-                        if not choices:
-                            continue
-                    except json.JSONDecodeError as e:
-                        logger.warning(
-                            f"Failed to parse chunk: {chunk_data}, error: {e}"
-                        )
-                        continue
-
-                    choice = choices[0]
-                    delta = choice.get("delta", {})
-                    finish_reason = choice.get("finish_reason")
-
-                    # Handle reasoning/thinking delta (o1/o3/o4 models + OpenRouter)
-                    (
-                        reasoning_events,
-                        has_thinking,
-                        thinking_block_index,
-                        text_block_index,
-                    ) = _handle_streaming_reasoning(
-                        delta, has_thinking, thinking_block_index, text_block_index
-                    )
-                    for event in reasoning_events:
-                        yield event
-
-                    # Handle text delta
-                    if delta and "content" in delta and delta["content"] is not None:
-                        if has_thinking and text_block_index == 1:
-                            # Close thinking block and start text block
-                            yield f"event: {Constants.EVENT_CONTENT_BLOCK_STOP}\ndata: {json.dumps({'type': Constants.EVENT_CONTENT_BLOCK_STOP, 'index': thinking_block_index}, ensure_ascii=False)}\n\n"
-                            yield f"event: {Constants.EVENT_CONTENT_BLOCK_START}\ndata: {json.dumps({'type': Constants.EVENT_CONTENT_BLOCK_START, 'index': text_block_index, 'content_block': {'type': Constants.CONTENT_TEXT, 'text': ''}}, ensure_ascii=False)}\n\n"
-                            has_thinking = False  # Already transitioned
-                        yield f"event: {Constants.EVENT_CONTENT_BLOCK_DELTA}\ndata: {json.dumps({'type': Constants.EVENT_CONTENT_BLOCK_DELTA, 'index': text_block_index, 'delta': {'type': Constants.DELTA_TEXT, 'text': delta['content']}}, ensure_ascii=False)}\n\n"
-
-                    # Handle tool call deltas with improved incremental processing
-                    if "tool_calls" in delta:
-                        for tc_delta in delta["tool_calls"]:
-                            tc_index = tc_delta.get("index", 0)
-
-                            # Initialize tool call tracking by index if not exists
-                            if tc_index not in current_tool_calls:
-                                current_tool_calls[tc_index] = {
-                                    "id": None,
-                                    "name": None,
-                                    "args_buffer": "",
-                                    "json_sent": False,
-                                    "claude_index": None,
-                                    "started": False,
-                                }
-
-                            tool_call = current_tool_calls[tc_index]
-
-                            # Update tool call ID if provided
-                            if tc_delta.get("id"):
-                                tool_call["id"] = tc_delta["id"]
-
-                            # Update function name and start content block if we have both id and name
-                            function_data = tc_delta.get(Constants.TOOL_FUNCTION, {})
-                            if function_data.get("name"):
-                                tool_call["name"] = function_data["name"]
-
-                            # Start content block when we have complete initial data
-                            if (
-                                tool_call["id"]
-                                and tool_call["name"]
-                                and not tool_call["started"]
-                            ):
-                                tool_block_counter += 1
-                                claude_index = text_block_index + tool_block_counter
-                                tool_call["claude_index"] = claude_index
-                                tool_call["started"] = True
-
-                                yield f"event: {Constants.EVENT_CONTENT_BLOCK_START}\ndata: {json.dumps({'type': Constants.EVENT_CONTENT_BLOCK_START, 'index': claude_index, 'content_block': {'type': Constants.CONTENT_TOOL_USE, 'id': tool_call['id'], 'name': tool_call['name'], 'input': {}}}, ensure_ascii=False)}\n\n"
-
-                            # Handle function arguments — send incremental deltas
-                            if (
-                                "arguments" in function_data
-                                and tool_call["started"]
-                                and function_data["arguments"] is not None
-                            ):
-                                args_chunk = function_data["arguments"]
-                                tool_call["args_buffer"] += args_chunk
-
-                                # Send each chunk as an incremental delta
-                                if args_chunk:
-                                    yield f"event: {Constants.EVENT_CONTENT_BLOCK_DELTA}\ndata: {json.dumps({'type': Constants.EVENT_CONTENT_BLOCK_DELTA, 'index': tool_call['claude_index'], 'delta': {'type': Constants.DELTA_INPUT_JSON, 'partial_json': args_chunk}}, ensure_ascii=False)}\n\n"
-
-                    # Handle finish reason
-                    if finish_reason:
-                        if finish_reason == "length":
-                            final_stop_reason = Constants.STOP_MAX_TOKENS
-                        elif finish_reason in ["tool_calls", "function_call"]:
-                            final_stop_reason = Constants.STOP_TOOL_USE
-                        elif finish_reason == "stop":
-                            final_stop_reason = Constants.STOP_END_TURN
-                        else:
-                            final_stop_reason = Constants.STOP_END_TURN
-                        break
-
-    except Exception as e:
-        # Handle any streaming errors gracefully
-        logger.error(f"Streaming error: {e}")
-        import traceback
-
-        logger.error(traceback.format_exc())
-        error_event = {
-            "type": "error",
-            "error": {"type": "api_error", "message": f"Streaming error: {str(e)}"},
-        }
-        yield f"event: error\ndata: {json.dumps(error_event, ensure_ascii=False)}\n\n"
-        return
-
-    # Close text block
-    yield f"event: {Constants.EVENT_CONTENT_BLOCK_STOP}\ndata: {json.dumps({'type': Constants.EVENT_CONTENT_BLOCK_STOP, 'index': text_block_index}, ensure_ascii=False)}\n\n"
+        while True:
+            if pending is None:
+                pending = asyncio.ensure_future(anext(stream))
+            until = deadline()
+            timeout = None if until is None else max(until - time.monotonic(), 0.0)
+            done, _ = await asyncio.wait((pending,), timeout=timeout)
+            if not done:
+                yield None
+                continue
+
+            read, pending = pending, None
+            try:
+                item = read.result()
+            except StopAsyncIteration:
+                return
+            yield item
+    finally:
+        if pending is not None:
+            pending.cancel()
+            try:
+                await pending
+            except (asyncio.CancelledError, StopAsyncIteration):
+                pass
+        await stream.aclose()
 
-    # Close all tool blocks (even incomplete ones to prevent client hangs)
-    for tool_data in current_tool_calls.values():
-        if tool_data.get("started") and tool_data.get("claude_index") is not None:
-            yield f"event: {Constants.EVENT_CONTENT_BLOCK_STOP}\ndata: {json.dumps({'type': Constants.EVENT_CONTENT_BLOCK_STOP, 'index': tool_data['claude_index']}, ensure_ascii=False)}\n\n"
 
-    usage_data = {"input_tokens": 0, "output_tokens": 0}
-    yield f"event: {Constants.EVENT_MESSAGE_DELTA}\ndata: {json.dumps({'type': Constants.EVENT_MESSAGE_DELTA, 'delta': {'stop_reason': final_stop_reason, 'stop_sequence': None}, 'usage': usage_data}, ensure_ascii=False)}\n\n"
-    yield f"event: {Constants.EVENT_MESSAGE_STOP}\ndata: {json.dumps({'type': Constants.EVENT_MESSAGE_STOP}, ensure_ascii=False)}\n\n"
+async def convert_openai_streaming_to_claude(
+    openai_stream: AsyncGenerator[ChatCompletionChunk | dict, None],
+    original_request: ClaudeMessagesRequest,
+    logger: logging.Logger,
+) -> AsyncGenerator[bytes, None]:
+    """Convert OpenAI streaming response to Claude streaming format."""
+    async for event in convert_openai_streaming_to_claude_with_cancellation(
+        openai_stream, original_request, logger
+    ):
+        yield event
 
 
 async def convert_openai_streaming_to_claude_with_cancellation(
-    openai_stream,
+    openai_stream: AsyncGenerator[ChatCompletionChunk | dict, None],
     original_request: ClaudeMessagesRequest,
-    logger,
-    http_request: Request,
-    openai_client,
-    request_id: str,
+    logger: logging.Logger,
+    http_request: Request | None = None,
+    request_id: str | None = None,
     start_time: float | None = None,
-):
-    """Convert OpenAI streaming response to Claude streaming format with cancellation support."""
+    merge_window: float = 0.0,
+) -> AsyncGenerator[bytes, None]:
+    """Convert OpenAI streaming response to Claude streaming format with cancellation support.
 
-    message_id = f"msg_{uuid.uuid4().hex[:24]}"
+    Cancellation is only checked when an http_request is given. A non-zero
+    merge_window (seconds) merges consecutive text/thinking deltas.
+    """
 
-    # Send initial SSE events
-    yield f"event: {Constants.EVENT_MESSAGE_START}\ndata: {json.dumps({'type': Constants.EVENT_MESSAGE_START, 'message': {'id': message_id, 'type': 'message', 'role': Constants.ROLE_ASSISTANT, 'model': original_request.model, 'content': [], 'stop_reason': None, 'stop_sequence': None, 'usage': {'input_tokens': 0, 'output_tokens': 0}}}, ensure_ascii=False)}\n\n"
+    message_id = _new_id("msg")
 
-    yield f"event: {Constants.EVENT_CONTENT_BLOCK_START}\ndata: {json.dumps({'type': Constants.EVENT_CONTENT_BLOCK_START, 'index': 0, 'content_block': {'type': Constants.CONTENT_TEXT, 'text': ''}}, ensure_ascii=False)}\n\n"
+    # Send initial SSE events
+    message_start = _sse_event(
+        _EVENT_MESSAGE_START,
+        {
+            "type": _EVENT_MESSAGE_START,
+            "message": {
+                "id": message_id,
+                "type": "message",
+                "role": _ROLE_ASSISTANT,
+                "model": original_request.model,
+                "content": [],
+                "stop_reason": None,
+                "stop_sequence": None,
+                "usage": {"input_tokens": 0, "output_tokens": 0},
+            },
+        },
+    )
 
-    yield f"event: {Constants.EVENT_PING}\ndata: {json.dumps({'type': Constants.EVENT_PING}, ensure_ascii=False)}\n\n"
+    yield b"".join((message_start, _PING_FRAME))
 
     # Process streaming chunks
-    text_block_index = 0
-    thinking_block_index = -1
-    tool_block_counter = 0
-    current_tool_calls = {}
-    final_stop_reason = Constants.STOP_END_TURN
+    blocks = _ContentBlocks(merge_window)
+    current_tool_calls: dict[int, dict[str, Any]] = {}
+    final_stop_reason = _STOP_END_TURN
     usage_data = {"input_tokens": 0, "output_tokens": 0}
-    has_thinking = False
+
+    extract = None
+
+    # Merging needs a timer so held text is sent while upstream is silent
+    chunks = (
+        _read_until_deadline(openai_stream, blocks.flush_deadline)
+        if merge_window
+        else openai_stream
+    )
 
     try:
-        async for line in openai_stream:
+        async for chunk in chunks:
+            if chunk is None:
+                # Merge window expired with no new chunk: send the held text
+                yield b"".join(blocks.flush())
+                continue
+
             # Check if client disconnected
-            if await http_request.is_disconnected():
-                logger.info(f"Client disconnected, cancelling request {request_id}")
-                openai_client.cancel_request(request_id)
+            if http_request is not None and await http_request.is_disconnected():
+                logger.info("Client disconnected, cancelling request %s", request_id)
+                # Closing the upstream generator releases its connection
+                await chunks.aclose()
                 break
 
-            if line.strip():
-                if line.startswith("data: "):
-                    chunk_data = line[6:]
-                    if chunk_data.strip() == "[DONE]":
-                        break
-
-                    try:
-                        chunk = json.loads(chunk_data)
-                        usage = chunk.get("usage", None)
-                        if usage:
-                            cache_read_input_tokens = 0
-                            prompt_tokens_details = (
-                                usage.get("prompt_tokens_details") or {}
-                            )
-                            cache_read_input_tokens = prompt_tokens_details.get(
-                                "cached_tokens", 0
+            if extract is None:
+                extract = _chunk_reader(chunk)
+            usage, delta, finish_reason = extract(chunk)
+            if usage is not None:
+                usage_data = usage
+            if delta is None:
+                continue
+
+            # Frames produced by this chunk go out in a single write
+            frames: list[bytes] = []
+
+            # Handle reasoning/thinking delta (o1/o3/o4 models + OpenRouter)
+            reasoning = _streaming_reasoning(delta)
+            if reasoning:
+                frames.extend(blocks.delta(_CONTENT_THINKING, reasoning))
+
+            # Handle text delta
+            content = delta.get("content")
+            if content is not None:
+                frames.extend(blocks.delta(_CONTENT_TEXT, content))
+
+            # Handle tool call deltas with improved incremental processing
+            if "tool_calls" in delta and delta["tool_calls"]:
+                for tc_delta in delta["tool_calls"]:
+                    tc_index = tc_delta.get("index", 0)
+
+                    # Initialize tool call tracking by index if not exists
+                    if tc_index not in current_tool_calls:
+                        current_tool_calls[tc_index] = {
+                            "id": None,
+                            "name": None,
+                            "claude_index": None,
+                            "started": False,
+                        }
+
+                    tool_call = current_tool_calls[tc_index]
+
+                    tc_id, tc_name, args_chunk = _tool_call_fields(tc_delta)
+
+                    # Update tool call ID if provided
+                    if tc_id:
+                        tool_call["id"] = tc_id
+
+                    # Update function name and start content block if we have both id and name
+                    if tc_name:
+                        tool_call["name"] = tc_name
+
+                    # Start content block when we have complete initial data
+                    if (
+                        tool_call["id"]
+                        and tool_call["name"]
+                        and not tool_call["started"]
+                    ):
+                        claude_index, start_frames = blocks.start_tool(
+                            tool_call["id"], tool_call["name"]
+                        )
+                        tool_call["claude_index"] = claude_index
+                        tool_call["started"] = True
+                        frames.extend(start_frames)
+
+                    # Handle function arguments — forward each chunk as an
+                    # incremental delta; the client assembles the JSON
+                    if tool_call["started"] and args_chunk:
+                        if isinstance(args_chunk, dict):
+                            # Pre-parsed arguments from some providers
+                            args_chunk = orjson.dumps(args_chunk).decode()
+                        frames.append(
+                            _delta_frame(
+                                tool_call["claude_index"],
+                                _DELTA_INPUT_JSON,
+                                "partial_json",
+                                args_chunk,
                             )
-                            usage_data = {
-                                "input_tokens": usage.get("prompt_tokens", 0),
-                                "output_tokens": usage.get("completion_tokens", 0),
-                                "cache_read_input_tokens": cache_read_input_tokens,
-                            }
-                        choices = chunk.get("choices", [])
-                        if not choices:
-                            continue
-                    except json.JSONDecodeError as e:
-                        logger.warning(
-                            f"Failed to parse chunk: {chunk_data}, error: {e}"
                         )
-                        continue
-
-                    choice = choices[0]
-                    delta = choice.get("delta", {})
-                    finish_reason = choice.get("finish_reason")
-
-                    # Handle reasoning/thinking delta (o1/o3/o4 models + OpenRouter)
-                    (
-                        reasoning_events,
-                        has_thinking,
-                        thinking_block_index,
-                        text_block_index,
-                    ) = _handle_streaming_reasoning(
-                        delta, has_thinking, thinking_block_index, text_block_index
-                    )
-                    for event in reasoning_events:
-                        yield event
-
-                    # Handle text delta
-                    if delta and "content" in delta and delta["content"] is not None:
-                        if has_thinking and text_block_index == 1:
-                            yield f"event: {Constants.EVENT_CONTENT_BLOCK_STOP}\ndata: {json.dumps({'type': Constants.EVENT_CONTENT_BLOCK_STOP, 'index': thinking_block_index}, ensure_ascii=False)}\n\n"
-                            yield f"event: {Constants.EVENT_CONTENT_BLOCK_START}\ndata: {json.dumps({'type': Constants.EVENT_CONTENT_BLOCK_START, 'index': text_block_index, 'content_block': {'type': Constants.CONTENT_TEXT, 'text': ''}}, ensure_ascii=False)}\n\n"
-                            has_thinking = False
-                        yield f"event: {Constants.EVENT_CONTENT_BLOCK_DELTA}\ndata: {json.dumps({'type': Constants.EVENT_CONTENT_BLOCK_DELTA, 'index': text_block_index, 'delta': {'type': Constants.DELTA_TEXT, 'text': delta['content']}}, ensure_ascii=False)}\n\n"
-
-                    # Handle tool call deltas with improved incremental processing
-                    if "tool_calls" in delta and delta["tool_calls"]:
-                        for tc_delta in delta["tool_calls"]:
-                            tc_index = tc_delta.get("index", 0)
-
-                            # Initialize tool call tracking by index if not exists
-                            if tc_index not in current_tool_calls:
-                                current_tool_calls[tc_index] = {
-                                    "id": None,
-                                    "name": None,
-                                    "args_buffer": "",
-                                    "json_sent": False,
-                                    "claude_index": None,
-                                    "started": False,
-                                }
-
-                            tool_call = current_tool_calls[tc_index]
-
-                            # Update tool call ID if provided
-                            if tc_delta.get("id"):
-                                tool_call["id"] = tc_delta["id"]
-
-                            # Update function name and start content block if we have both id and name
-                            function_data = tc_delta.get(Constants.TOOL_FUNCTION, {})
-                            if function_data.get("name"):
-                                tool_call["name"] = function_data["name"]
-
-                            # Start content block when we have complete initial data
-                            if (
-                                tool_call["id"]
-                                and tool_call["name"]
-                                and not tool_call["started"]
-                            ):
-                                tool_block_counter += 1
-                                claude_index = text_block_index + tool_block_counter
-                                tool_call["claude_index"] = claude_index
-                                tool_call["started"] = True
-
-                                yield f"event: {Constants.EVENT_CONTENT_BLOCK_START}\ndata: {json.dumps({'type': Constants.EVENT_CONTENT_BLOCK_START, 'index': claude_index, 'content_block': {'type': Constants.CONTENT_TOOL_USE, 'id': tool_call['id'], 'name': tool_call['name'], 'input': {}}}, ensure_ascii=False)}\n\n"
-
-                            # Handle function arguments — send incremental deltas
-                            if (
-                                "arguments" in function_data
-                                and tool_call["started"]
-                                and function_data["arguments"] is not None
-                            ):
-                                args_chunk = function_data["arguments"]
-                                tool_call["args_buffer"] += args_chunk
-
-                                # Send each chunk as an incremental delta
-                                if args_chunk:
-                                    yield f"event: {Constants.EVENT_CONTENT_BLOCK_DELTA}\ndata: {json.dumps({'type': Constants.EVENT_CONTENT_BLOCK_DELTA, 'index': tool_call['claude_index'], 'delta': {'type': Constants.DELTA_INPUT_JSON, 'partial_json': args_chunk}}, ensure_ascii=False)}\n\n"
-
-                    # Handle finish reason
-                    if finish_reason:
-                        if finish_reason == "length":
-                            final_stop_reason = Constants.STOP_MAX_TOKENS
-                        elif finish_reason in ["tool_calls", "function_call"]:
-                            final_stop_reason = Constants.STOP_TOOL_USE
-                        elif finish_reason == "stop":
-                            final_stop_reason = Constants.STOP_END_TURN
-                        else:
-                            final_stop_reason = Constants.STOP_END_TURN
-
-    except HTTPException as e:
-        # Handle cancellation
-        if e.status_code == 499:
-            logger.info(f"Request {request_id} was cancelled")
-            error_event = {
-                "type": "error",
-                "error": {
-                    "type": "cancelled",
-                    "message": "Request was cancelled by client",
-                },
-            }
-            yield f"event: error\ndata: {json.dumps(error_event, ensure_ascii=False)}\n\n"
-            return
-        else:
-            raise
+
+            # Handle finish reason
+            if finish_reason:
+                final_stop_reason = _STOP_REASON_MAP.get(finish_reason, _STOP_END_TURN)
+
+            if frames:
+                yield b"".join(frames)
+
+    except HTTPException:
+        # Upstream errors already mapped by OpenAIClient. Client disconnects
+        # close the upstream generator instead of raising here
+        raise
     except Exception as e:
         # Handle any streaming errors gracefully
-        logger.error(f"Streaming error: {e}")
-        import traceback
-
-        logger.error(traceback.format_exc())
+        logger.exception("Streaming error: %s", e)
         error_event = {
             "type": "error",
             "error": {"type": "api_error", "message": f"Streaming error: {str(e)}"},
         }
-        yield f"event: error\ndata: {json.dumps(error_event, ensure_ascii=False)}\n\n"
+        # Deliver any merged text still held back before the error
+        frames = blocks.flush()
+        frames.append(_sse_event("error", error_event))
+        yield b"".join(frames)
         return
 
-    # Close text block
-    yield f"event: {Constants.EVENT_CONTENT_BLOCK_STOP}\ndata: {json.dumps({'type': Constants.EVENT_CONTENT_BLOCK_STOP, 'index': text_block_index}, ensure_ascii=False)}\n\n"
-
-    # Close all tool blocks (even incomplete ones to prevent client hangs)
-    for tool_data in current_tool_calls.values():
-        if tool_data.get("started") and tool_data.get("claude_index") is not None:
-            yield f"event: {Constants.EVENT_CONTENT_BLOCK_STOP}\ndata: {json.dumps({'type': Constants.EVENT_CONTENT_BLOCK_STOP, 'index': tool_data['claude_index']}, ensure_ascii=False)}\n\n"
-
-    yield f"event: {Constants.EVENT_MESSAGE_DELTA}\ndata: {json.dumps({'type': Constants.EVENT_MESSAGE_DELTA, 'delta': {'stop_reason': final_stop_reason, 'stop_sequence': None}, 'usage': usage_data}, ensure_ascii=False)}\n\n"
-    yield f"event: {Constants.EVENT_MESSAGE_STOP}\ndata: {json.dumps({'type': Constants.EVENT_MESSAGE_STOP}, ensure_ascii=False)}\n\n"
+    # Close the open text/thinking block and all tool blocks (even
+    # incomplete ones to prevent client hangs), then finish the message
+    frames = blocks.close_all()
+    frames.append(
+        _sse_event(
+            _EVENT_MESSAGE_DELTA,
+            {
+                "type": _EVENT_MESSAGE_DELTA,
+                "delta": {"stop_reason": final_stop_reason, "stop_sequence": None},
+                "usage": usage_data,
+            },
+        )
+    )
+    frames.append(_MESSAGE_STOP_FRAME)
+    yield b"".join(frames)
 
     # Log throughput for streaming
     if start_time is not None:
@@ -514,5 +779,9 @@ async def convert_openai_streaming_to_claude_with_cancellation(
         tok_s = output_tokens / elapsed if elapsed > 0 else 0
         model = original_request.model
         logger.info(
-            f"Request completed: model={model}, {output_tokens} tokens in {elapsed:.1f}s ({tok_s:.1f} tok/s)"
+            "Request completed: model=%s, %s tokens in %.1fs (%.1f tok/s)",
+            model,
+            output_tokens,
+            elapsed,
+            tok_s,
         )
@@ -1,9 +1,10 @@
 import asyncio
-import json
 from typing import Optional, AsyncGenerator, Dict, Any
 
+import httpx
 from fastapi import HTTPException
 from openai import AsyncOpenAI, AsyncAzureOpenAI
+from openai.types.chat import ChatCompletion, ChatCompletionChunk
 from openai._exceptions import (
     APIError,
     RateLimitError,
@@ -11,9 +12,67 @@ from openai._exceptions import (
     BadRequestError,
 )
 
+# Headers sent with every upstream request; CUSTOM_HEADER_* values override
+_DEFAULT_HEADERS = {
+    "Content-Type": "application/json",
+    "User-Agent": "claude-proxy/1.0.0",
+}
+
+_INVALID_API_KEY_MESSAGE = (
+    "Invalid API key. Please check your OPENAI_API_KEY configuration."
+)
+_RATE_LIMIT_MESSAGE = (
+    "Rate limit exceeded. Please wait and try again, or upgrade your API plan."
+)
+_MODEL_NOT_FOUND_MESSAGE = (
+    "Model not found. Please check your BIG_MODEL and SMALL_MODEL configuration."
+)
+
+# (required, any-of needles, message) checked in order against the casefolded
+# error text; "" as required always matches
+_ERROR_RULES: tuple[tuple[str, tuple[str, ...], str], ...] = (
+    # Region/country restrictions
+    (
+        "",
+        (
+            "unsupported_country_region_territory",
+            "country, region, or territory not supported",
+        ),
+        "OpenAI API is not available in your region. Consider using a VPN or Azure OpenAI service.",
+    ),
+    # API key issues
+    (
+        "",
+        ("invalid_api_key", "unauthorized"),
+        _INVALID_API_KEY_MESSAGE,
+    ),
+    # Rate limiting
+    (
+        "",
+        ("rate_limit", "quota"),
+        _RATE_LIMIT_MESSAGE,
+    ),
+    # Model not found
+    (
+        "model",
+        ("not found", "does not exist"),
+        _MODEL_NOT_FOUND_MESSAGE,
+    ),
+    # Billing issues
+    (
+        "",
+        ("billing", "payment"),
+        "Billing issue. Please check your OpenAI account billing status.",
+    ),
+)
+
 
 class OpenAIClient:
-    """Async OpenAI client with cancellation support."""
+    """Async OpenAI client with cancellation support.
+
+    Create one instance and reuse it; pass http_client to share an explicit
+    connection pool (the caller owns it and closes it on shutdown).
+    """
 
     def __init__(
         self,
@@ -22,19 +81,15 @@ class OpenAIClient:
         timeout: int = 90,
         api_version: Optional[str] = None,
         custom_headers: Optional[Dict[str, str]] = None,
+        http_client: Optional[httpx.AsyncClient] = None,
+        max_retries: int = 2,
     ):
         self.api_key = api_key
         self.base_url = base_url
         self.custom_headers = custom_headers or {}
 
-        # Prepare default headers
-        default_headers = {
-            "Content-Type": "application/json",
-            "User-Agent": "claude-proxy/1.0.0",
-        }
-
         # Merge custom headers with default headers
-        all_headers = {**default_headers, **self.custom_headers}
+        all_headers = {**_DEFAULT_HEADERS, **self.custom_headers}
 
         # Detect if using Azure and instantiate the appropriate client
         if api_version:
@@ -43,76 +98,62 @@ class OpenAIClient:
                 azure_endpoint=base_url,
                 api_version=api_version,
                 timeout=timeout,
+                max_retries=max_retries,
                 default_headers=all_headers,
+                http_client=http_client,
             )
         else:
             self.client = AsyncOpenAI(
                 api_key=api_key,
                 base_url=base_url,
                 timeout=timeout,
+                max_retries=max_retries,
                 default_headers=all_headers,
+                http_client=http_client,
             )
-        self.active_requests: Dict[str, asyncio.Event] = {}
-        self._requests_lock = asyncio.Lock()
+        self.active_requests: Dict[str, asyncio.Task] = {}
 
     async def create_chat_completion(
         self, request: Dict[str, Any], request_id: Optional[str] = None
-    ) -> Dict[str, Any]:
+    ) -> ChatCompletion:
         """Send chat completion to OpenAI API with cancellation support."""
 
-        # Create cancellation token if request_id provided
-        if request_id:
-            cancel_event = asyncio.Event()
-            async with self._requests_lock:
-                self.active_requests[request_id] = cancel_event
-
         try:
-            # Create task that can be cancelled
+            if not request_id:
+                # Untracked: nothing can cancel it, so skip the task and
+                # the active_requests bookkeeping
+                return await self.client.chat.completions.create(**request)
+
+            # Run the upstream call as a task so cancel_request() can cancel it
+            # Register with no await in between, so a cancellation can never
+            # see the task running but unregistered
             completion_task = asyncio.create_task(
                 self.client.chat.completions.create(**request)
             )
+            self.active_requests[request_id] = completion_task
 
-            if request_id:
-                # Wait for either completion or cancellation
-                cancel_task = asyncio.create_task(cancel_event.wait())
-                done, pending = await asyncio.wait(
-                    [completion_task, cancel_task], return_when=asyncio.FIRST_COMPLETED
+            completion = await completion_task
+
+            # Hand back the SDK object; the response converter reads it by
+            # attribute instead of walking a model_dump() copy
+            return completion
+
+        except asyncio.CancelledError:
+            # cancel_request() unregisters the task before cancelling it;
+            # anything else is our own caller being cancelled
+            if request_id and request_id not in self.active_requests:
+                raise HTTPException(
+                    status_code=499, detail="Request cancelled by client"
                 )
+            raise
 
-                # Cancel pending tasks
-                for task in pending:
-                    task.cancel()
-                    try:
-                        await task
-                    except asyncio.CancelledError:
-                        pass
-
-                # Check if request was cancelled
-                if cancel_task in done:
-                    completion_task.cancel()
-                    raise HTTPException(
-                        status_code=499, detail="Request cancelled by client"
-                    )
-
-                completion = await completion_task
-            else:
-                completion = await completion_task
-
-            # Convert to dict format that matches the original interface
-            return completion.model_dump()
-
-        except AuthenticationError as e:
-            raise HTTPException(
-                status_code=401, detail=self.classify_openai_error(str(e))
-            )
-        except RateLimitError as e:
-            raise HTTPException(
-                status_code=429, detail=self.classify_openai_error(str(e))
-            )
+        except AuthenticationError:
+            # Typed SDK errors need no message scan
+            raise HTTPException(status_code=401, detail=_INVALID_API_KEY_MESSAGE)
+        except RateLimitError:
+            raise HTTPException(status_code=429, detail=_RATE_LIMIT_MESSAGE)
         except BadRequestError as e:
-            raise HTTPException(
-                status_code=400, detail=self.classify_openai_error(str(e))
-            )
+            raise HTTPException(status_code=400, detail=self._bad_request_detail(e))
         except APIError as e:
             status_code = getattr(e, "status_code", 500)
             raise HTTPException(
@@ -124,19 +165,16 @@ class OpenAIClient:
         finally:
             # Clean up active request tracking
             if request_id:
-                async with self._requests_lock:
-                    self.active_requests.pop(request_id, None)
+                self.active_requests.pop(request_id, None)
 
     async def create_chat_completion_stream(
-        self, request: Dict[str, Any], request_id: Optional[str] = None
-    ) -> AsyncGenerator[str, None]:
-        """Send streaming chat completion to OpenAI API with cancellation support."""
+        self, request: Dict[str, Any]
+    ) -> AsyncGenerator[ChatCompletionChunk, None]:
+        """Send streaming chat completion to OpenAI API.
 
-        # Create cancellation token if request_id provided
-        if request_id:
-            cancel_event = asyncio.Event()
-            async with self._requests_lock:
-                self.active_requests[request_id] = cancel_event
+        Cancel by closing the returned generator (aclose()); that closes the
+        upstream response. Streams are not tracked in active_requests.
+        """
 
         try:
             # Ensure stream is enabled
@@ -148,35 +186,24 @@ class OpenAIClient:
             # Create the streaming completion
             streaming_completion = await self.client.chat.completions.create(**request)
 
-            async for chunk in streaming_completion:
-                # Check for cancellation before yielding each chunk
-                if request_id:
-                    cancel_ev = self.active_requests.get(request_id)
-                    if cancel_ev and cancel_ev.is_set():
-                        raise HTTPException(
-                            status_code=499, detail="Request cancelled by client"
-                        )
-
-                # Convert chunk to SSE format matching original HTTP client format
-                chunk_dict = chunk.model_dump()
-                chunk_json = json.dumps(chunk_dict, ensure_ascii=False)
-                yield f"data: {chunk_json}"
-
-            # Signal end of stream
-            yield "data: [DONE]"
-
-        except AuthenticationError as e:
-            raise HTTPException(
-                status_code=401, detail=self.classify_openai_error(str(e))
-            )
-        except RateLimitError as e:
-            raise HTTPException(
-                status_code=429, detail=self.classify_openai_error(str(e))
-            )
+            # Cancelling a stream is done by closing this generator (the
+            # converter does so when the client disconnects), which releases
+            # the upstream response without a per-chunk flag check
+            try:
+                async for chunk in streaming_completion:
+                    # Hand the SDK chunk over as-is; the converter reads the few
+                    # fields it needs instead of walking a model_dump() copy
+                    yield chunk
+            finally:
+                await streaming_completion.close()
+
+        except AuthenticationError:
+            # Typed SDK errors need no message scan
+            raise HTTPException(status_code=401, detail=_INVALID_API_KEY_MESSAGE)
+        except RateLimitError:
+            raise HTTPException(status_code=429, detail=_RATE_LIMIT_MESSAGE)
         except BadRequestError as e:
-            raise HTTPException(
-                status_code=400, detail=self.classify_openai_error(str(e))
-            )
+            raise HTTPException(status_code=400, detail=self._bad_request_detail(e))
         except APIError as e:
             status_code = getattr(e, "status_code", 500)
             raise HTTPException(
@@ -185,48 +212,26 @@ class OpenAIClient:
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"Unexpected error: {str(e)}")
 
-        finally:
-            # Clean up active request tracking
-            if request_id:
-                async with self._requests_lock:
-                    self.active_requests.pop(request_id, None)
-
     def classify_openai_error(self, error_detail: Any) -> str:
         """Provide specific error guidance for common OpenAI API issues."""
-        error_str = str(error_detail).lower()
-
-        # Region/country restrictions
-        if (
-            "unsupported_country_region_territory" in error_str
-            or "country, region, or territory not supported" in error_str
-        ):
-            return "OpenAI API is not available in your region. Consider using a VPN or Azure OpenAI service."
-
-        # API key issues
-        if "invalid_api_key" in error_str or "unauthorized" in error_str:
-            return "Invalid API key. Please check your OPENAI_API_KEY configuration."
-
-        # Rate limiting
-        if "rate_limit" in error_str or "quota" in error_str:
-            return "Rate limit exceeded. Please wait and try again, or upgrade your API plan."
-
-        # Model not found
-        if "model" in error_str and (
-            "not found" in error_str or "does not exist" in error_str
-        ):
-            return "Model not found. Please check your BIG_MODEL and SMALL_MODEL configuration."
-
-        # Billing issues
-        if "billing" in error_str or "payment" in error_str:
-            return "Billing issue. Please check your OpenAI account billing status."
+        error_str = str(error_detail).casefold()
+        for required, needles, message in _ERROR_RULES:
+            if required in error_str and any(n in error_str for n in needles):
+                return message
 
         # Default: return original message
         return str(error_detail)
 
+    def _bad_request_detail(self, error: BadRequestError) -> str:
+        """Message for a 400, using the structured error code when present."""
+        if error.code == "model_not_found":
+            return _MODEL_NOT_FOUND_MESSAGE
+        return self.classify_openai_error(str(error))
+
     def cancel_request(self, request_id: str) -> bool:
-        """Cancel an active request by request_id."""
-        cancel_ev = self.active_requests.get(request_id)
-        if cancel_ev:
-            cancel_ev.set()
+        """Cancel an active non-streaming request by request_id."""
+        task = self.active_requests.pop(request_id, None)
+        if task:
+            task.cancel()
             return True
         return False
@@ -40,12 +40,24 @@ class Config:
         # Connection settings
         self.request_timeout = int(os.environ.get("REQUEST_TIMEOUT", "120"))
         self.max_retries = int(os.environ.get("MAX_RETRIES", "2"))
+        self.max_connections = int(os.environ.get("MAX_CONNECTIONS", "256"))
+        self.max_keepalive_connections = int(
+            os.environ.get("MAX_KEEPALIVE_CONNECTIONS", "64")
+        )
+        self.keepalive_expiry = float(os.environ.get("KEEPALIVE_EXPIRY", "30"))
+        self.enable_http2 = os.environ.get("ENABLE_HTTP2", "true").lower() == "true"
+
+        # Streaming settings
+        self.sse_coalesce_ms = float(os.environ.get("SSE_COALESCE_MS", "0"))
 
         # Model settings - BIG, MIDDLE, and SMALL models
         self.big_model = os.environ.get("BIG_MODEL", "gpt-4o")
         self.middle_model = os.environ.get("MIDDLE_MODEL", self.big_model)
         self.small_model = os.environ.get("SMALL_MODEL", "gpt-4o-mini")
 
+        # CUSTOM_HEADER_* values, filled on first get_custom_headers() call
+        self._custom_headers = None
+
     def is_reasoning_model(self, model: str) -> bool:
         """Check if model uses reasoning/thinking (o1, o3, o4 series)."""
         model_lower = model.lower()
@@ -63,7 +75,7 @@ class Config:
         if not self.openai_api_key:
             return False
         # Accept any non-empty key (supports OpenAI, Azure, custom proxies)
-        return len(self.openai_api_key.strip()) > 0
+        return bool(self.openai_api_key.strip())
 
     def validate_client_api_key(self, client_api_key):
         """Validate client's Anthropic API key"""
@@ -75,14 +87,14 @@ class Config:
         return client_api_key == self.anthropic_api_key
 
     def get_custom_headers(self):
-        """Get custom headers from environment variables"""
-        custom_headers = {}
+        """Get custom headers from environment variables (computed once)"""
+        if self._custom_headers is not None:
+            return self._custom_headers
 
-        # Get all environment variables
-        env_vars = dict(os.environ)
+        custom_headers = {}
 
         # Find CUSTOM_HEADER_* environment variables
-        for env_key, env_value in env_vars.items():
+        for env_key, env_value in os.environ.items():
             if env_key.startswith("CUSTOM_HEADER_"):
                 # Convert CUSTOM_HEADER_KEY to Header-Key
                 # Remove 'CUSTOM_HEADER_' prefix and convert to header format
@@ -93,6 +105,7 @@ class Config:
                     header_name = header_name.replace("_", "-")
                     custom_headers[header_name] = env_value
 
+        self._custom_headers = custom_headers
         return custom_headers
 
 
@@ -1,3 +1,5 @@
+from functools import lru_cache
+
 from src.core.config import config
 
 
@@ -24,29 +26,46 @@ class ModelManager:
         "databricks/",  # Other providers
     )
 
+    # Claude model family keyword → Config attribute holding the target model
+    TIER_KEYWORDS = (
+        ("haiku", "small_model"),
+        ("sonnet", "middle_model"),
+        ("opus", "big_model"),
+    )
+
     def __init__(self, cfg):
         self.config = cfg
 
     def map_claude_model_to_openai(self, claude_model: str) -> str:
         """Map Claude model names to configured OpenAI-compatible model names."""
-        # If it already looks like a provider model, pass through
-        if any(
-            claude_model.startswith(p) or claude_model.lower().startswith(p)
-            for p in self.PASSTHROUGH_PREFIXES
-        ):
+        tier = _model_tier(claude_model)
+        if tier is None:
             return claude_model
+        return getattr(self.config, tier)
+
+
+@lru_cache(maxsize=256)
+def _model_tier(claude_model: str) -> str | None:
+    """Config attribute a model name maps to, or None to pass it through.
+
+    Clients send the same handful of model names on every request, so the
+    lowercasing and substring checks are memoized; the configured model is
+    still read from Config on each call.
+    """
+    model_lower = claude_model.lower()
+
+    # If it already looks like a provider model, pass through
+    # (prefixes are lowercase, so one check on the lowered name covers both)
+    if model_lower.startswith(ModelManager.PASSTHROUGH_PREFIXES):
+        return None
+
+    # Map based on Claude model naming patterns
+    for keyword, tier in ModelManager.TIER_KEYWORDS:
+        if keyword in model_lower:
+            return tier
 
-        # Map based on Claude model naming patterns
-        model_lower = claude_model.lower()
-        if "haiku" in model_lower:
-            return self.config.small_model
-        elif "sonnet" in model_lower:
-            return self.config.middle_model
-        elif "opus" in model_lower:
-            return self.config.big_model
-        else:
-            # Default to big model for unknown models
-            return self.config.big_model
+    # Default to big model for unknown models
+    return "big_model"
 
 
 model_manager = ModelManager(config)
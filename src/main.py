@@ -1,12 +1,26 @@
 import sys
+from contextlib import asynccontextmanager
 
 import uvicorn
 from fastapi import FastAPI
 
-from src.api.endpoints import router as api_router
+from src.api.endpoints import (
+    openai_http_client,
+    passthrough_client,
+    router as api_router,
+)
 from src.core.config import config
 
-app = FastAPI(title="Claude-to-OpenAI API Proxy", version="2.0.0")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    # Release pooled upstream connections on shutdown
+    await passthrough_client.aclose()
+    await openai_http_client.aclose()
+
+
+app = FastAPI(title="Claude-to-OpenAI API Proxy", version="2.0.0", lifespan=lifespan)
 
 app.include_router(api_router)
 
@@ -35,6 +49,16 @@ def main():
         print("  MAX_TOKENS_LIMIT - Token limit (default: 4096)")
         print("  MIN_TOKENS_LIMIT - Minimum token limit (default: 100)")
         print("  REQUEST_TIMEOUT - Request timeout in seconds (default: 90)")
+        print("  MAX_RETRIES - SDK retries for failed upstream calls (default: 2)")
+        print("  MAX_CONNECTIONS - Upstream connection pool size (default: 256)")
+        print(
+            "  MAX_KEEPALIVE_CONNECTIONS - Idle upstream connections kept open (default: 64)"
+        )
+        print("  KEEPALIVE_EXPIRY - Idle connection lifetime in seconds (default: 30)")
+        print("  ENABLE_HTTP2 - Negotiate HTTP/2 with upstreams (default: true)")
+        print(
+            "  SSE_COALESCE_MS - Batch SSE events/text deltas within N ms (default: 0)"
+        )
         print("")
         print("Model mapping:")
         print(f"  Claude haiku models -> {config.small_model}")
@@ -1,3 +1,4 @@
+from functools import cached_property
 from typing import List, Dict, Any, Optional, Union, Literal
 
 from pydantic import BaseModel
@@ -71,6 +72,11 @@ class ClaudeMessagesRequest(BaseModel):
     tool_choice: Optional[Dict[str, Any]] = None
     thinking: Optional[ClaudeThinkingConfig] = None
 
+    @cached_property
+    def is_claude_model(self) -> bool:
+        """Whether the requested model is a Claude model (passthrough candidate)."""
+        return "claude" in self.model.lower()
+
 
 class ClaudeTokenCountRequest(BaseModel):
     model: str
@@ -33,6 +33,9 @@ proxy_headers = {
     "content-type": "application/json",
 }
 
+# Reuse one connection pool for all non-streaming requests
+http_client = httpx.Client()
+
 # Tool definitions
 calculator_tool = {
     "name": "calculator",
@@ -188,7 +191,7 @@ REQUIRED_EVENT_TYPES = {
 def get_response(url, headers, data):
     """Send a request and get the response."""
     start_time = time.time()
-    response = httpx.post(url, headers=headers, json=data, timeout=30)
+    response = http_client.post(url, headers=headers, json=data, timeout=30)
     elapsed = time.time() - start_time
 
     print(f"Response time: {elapsed:.2f} seconds")
@@ -435,80 +438,79 @@ class StreamStats:
             print(f"Error: {self.error_message}")
 
 
-async def stream_response(url, headers, data, stream_name):
+async def stream_response(client, url, headers, data, stream_name):
     """Send a streaming request and process the response."""
     print(f"\nStarting {stream_name} stream...")
     stats = StreamStats()
     error = None
 
     try:
-        async with httpx.AsyncClient() as client:
-            # Add stream flag to ensure it's streamed
-            request_data = data.copy()
-            request_data["stream"] = True
-
-            start_time = time.time()
-            async with client.stream("POST", url, json=request_data, headers=headers, timeout=30) as response:
-                if response.status_code != 200:
-                    error_text = await response.aread()
-                    stats.has_error = True
-                    stats.error_message = f"HTTP {response.status_code}: {error_text.decode('utf-8')}"
-                    error = stats.error_message
-                    print(f"Error: {stats.error_message}")
-                    return stats, error
-
-                print(f"{stream_name} connected, receiving events...")
-
-                # Process each chunk
-                buffer = ""
-                async for chunk in response.aiter_text():
-                    if not chunk.strip():
+        # Add stream flag to ensure it's streamed
+        request_data = data.copy()
+        request_data["stream"] = True
+
+        start_time = time.time()
+        async with client.stream("POST", url, json=request_data, headers=headers, timeout=30) as response:
+            if response.status_code != 200:
+                error_text = await response.aread()
+                stats.has_error = True
+                stats.error_message = f"HTTP {response.status_code}: {error_text.decode('utf-8')}"
+                error = stats.error_message
+                print(f"Error: {stats.error_message}")
+                return stats, error
+
+            print(f"{stream_name} connected, receiving events...")
+
+            # Process each chunk
+            buffer = ""
+            async for chunk in response.aiter_text():
+                if not chunk.strip():
+                    continue
+
+                # Handle multiple events in one chunk
+                buffer += chunk
+                events = buffer.split("\n\n")
+
+                # Process all complete events
+                for event_text in events[:-1]:  # All but the last (possibly incomplete) event
+                    if not event_text.strip():
                         continue
 
-                    # Handle multiple events in one chunk
-                    buffer += chunk
-                    events = buffer.split("\n\n")
-
-                    # Process all complete events
-                    for event_text in events[:-1]:  # All but the last (possibly incomplete) event
-                        if not event_text.strip():
-                            continue
-
-                        # Parse server-sent event format
-                        if "data: " in event_text:
-                            # Extract the data part
-                            data_parts = []
-                            for line in event_text.split("\n"):
-                                if line.startswith("data: "):
-                                    data_part = line[len("data: "):]
-                                    # Skip the "[DONE]" marker
-                                    if data_part == "[DONE]":
-                                        break
-                                    data_parts.append(data_part)
-
-                            if data_parts:
-                                try:
-                                    event_data = json.loads("".join(data_parts))
-                                    stats.add_event(event_data)
-                                except json.JSONDecodeError as e:
-                                    print(f"Error parsing event: {e}\nRaw data: {''.join(data_parts)}")
-
-                    # Keep the last (potentially incomplete) event for the next iteration
-                    buffer = events[-1] if events else ""
-
-                # Process any remaining complete events in the buffer
-                if buffer.strip():
-                    lines = buffer.strip().split("\n")
-                    data_lines = [line[len("data: "):] for line in lines if line.startswith("data: ")]
-                    if data_lines and data_lines[0] != "[DONE]":
-                        try:
-                            event_data = json.loads("".join(data_lines))
-                            stats.add_event(event_data)
-                        except:
-                            pass
-
-            elapsed = time.time() - start_time
-            print(f"{stream_name} stream completed in {elapsed:.2f} seconds")
+                    # Parse server-sent event format
+                    if "data: " in event_text:
+                        # Extract the data part
+                        data_parts = []
+                        for line in event_text.split("\n"):
+                            if line.startswith("data: "):
+                                data_part = line[len("data: "):]
+                                # Skip the "[DONE]" marker
+                                if data_part == "[DONE]":
+                                    break
+                                data_parts.append(data_part)
+
+                        if data_parts:
+                            try:
+                                event_data = json.loads("".join(data_parts))
+                                stats.add_event(event_data)
+                            except json.JSONDecodeError as e:
+                                print(f"Error parsing event: {e}\nRaw data: {''.join(data_parts)}")
+
+                # Keep the last (potentially incomplete) event for the next iteration
+                buffer = events[-1] if events else ""
+
+            # Process any remaining complete events in the buffer
+            if buffer.strip():
+                lines = buffer.strip().split("\n")
+                data_lines = [line[len("data: "):] for line in lines if line.startswith("data: ")]
+                if data_lines and data_lines[0] != "[DONE]":
+                    try:
+                        event_data = json.loads("".join(data_lines))
+                        stats.add_event(event_data)
+                    except:
+                        pass
+
+        elapsed = time.time() - start_time
+        print(f"{stream_name} stream completed in {elapsed:.2f} seconds")
     except Exception as e:
         stats.has_error = True
         stats.error_message = str(e)
@@ -560,7 +562,7 @@ def compare_stream_stats(anthropic_stats, proxy_stats):
             len(proxy_stats.text_content) > 0 or proxy_stats.has_tool_use)
 
 
-async def test_streaming(test_name, request_data):
+async def test_streaming(client, test_name, request_data):
     """Run a streaming test with the given request data."""
     print(f"\n{'=' * 20} RUNNING STREAMING TEST: {test_name} {'=' * 20}")
 
@@ -581,11 +583,11 @@ async def test_streaming(test_name, request_data):
     try:
         # Send streaming requests
         anthropic_stats, anthropic_error = await stream_response(
-            ANTHROPIC_API_URL, anthropic_headers, anthropic_data, "Anthropic"
+            client, ANTHROPIC_API_URL, anthropic_headers, anthropic_data, "Anthropic"
         )
 
         proxy_stats, proxy_error = await stream_response(
-            PROXY_API_URL, proxy_headers, proxy_data, "Proxy"
+            client, PROXY_API_URL, proxy_headers, proxy_data, "Proxy"
         )
 
         # Print statistics
@@ -656,22 +658,23 @@ async def run_tests(args):
     # Now run streaming tests
     if not args.no_streaming:
         print("\n\n=========== RUNNING STREAMING TESTS ===========\n")
-        for test_name, test_data in TEST_SCENARIOS.items():
-            # Only select streaming tests, or force streaming
-            if not test_data.get("stream") and not test_name.endswith("_stream"):
-                continue
-
-            # Skip tool tests if requested
-            if args.simple and "tools" in test_data:
-                continue
-
-            # Skip non-tool tests if tools_only
-            if args.tools_only and "tools" not in test_data:
-                continue
-
-            # Run the streaming test
-            result = await test_streaming(test_name, test_data)
-            results[f"{test_name}_streaming"] = result
+        async with httpx.AsyncClient() as client:
+            for test_name, test_data in TEST_SCENARIOS.items():
+                # Only select streaming tests, or force streaming
+                if not test_data.get("stream") and not test_name.endswith("_stream"):
+                    continue
+
+                # Skip tool tests if requested
+                if args.simple and "tools" in test_data:
+                    continue
+
+                # Skip non-tool tests if tools_only
+                if args.tools_only and "tools" not in test_data:
+                    continue
+
+                # Run the streaming test
+                result = await test_streaming(client, test_name, test_data)
+                results[f"{test_name}_streaming"] = result
 
     # Print summary
     print("\n\n=========== TEST SUMMARY ===========\n")
@@ -1,37 +1,63 @@
 import json
 import unittest
-from unittest.mock import patch, MagicMock
 
-from src.models.schema import MessagesRequest, Message, Tool
-from src.services.converter import convert_anthropic_to_litellm, convert_litellm_to_anthropic
+from fastapi import HTTPException
+from openai.types.chat import ChatCompletion
+
+from src.core.config import config
+from src.core.model_manager import model_manager
+from src.models.claude import ClaudeMessagesRequest, ClaudeMessage, ClaudeTool
+from src.conversion.request_converter import (
+    convert_claude_to_openai,
+    convert_claude_tools,
+    parse_tool_result_content,
+)
+from src.conversion.response_converter import convert_openai_to_claude_response
+
+
+def make_chat_completion(message, finish_reason, prompt_tokens, completion_tokens):
+    """Build a real SDK ChatCompletion, as the OpenAI client returns it"""
+    return ChatCompletion.model_validate({
+        "id": "chatcmpl-abc123",
+        "object": "chat.completion",
+        "created": 1,
+        "model": "gpt-4o",
+        "choices": [{"index": 0, "message": message, "finish_reason": finish_reason}],
+        "usage": {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+        },
+    })
 
 
 class TestConverter(unittest.TestCase):
     """Test the converter functions"""
 
-    def setUp(self):
-        """Setup common test data"""
+    @classmethod
+    def setUpClass(cls):
+        """Setup common test data once; tests must not mutate these fixtures"""
         # Simple test request with text only
-        self.simple_request = MessagesRequest(
+        cls.simple_request = ClaudeMessagesRequest(
             model="claude-3-sonnet-20240229",
             max_tokens=300,
             messages=[
-                Message(role="user", content="Hello, world!")
+                ClaudeMessage(role="user", content="Hello, world!")
             ]
         )
 
         # Request with system prompt
-        self.system_request = MessagesRequest(
+        cls.system_request = ClaudeMessagesRequest(
             model="claude-3-sonnet-20240229",
             max_tokens=300,
             system="You are a helpful assistant.",
             messages=[
-                Message(role="user", content="Tell me about Paris.")
+                ClaudeMessage(role="user", content="Tell me about Paris.")
             ]
         )
 
         # Request with tools
-        self.calculator_tool = Tool(
+        cls.calculator_tool = ClaudeTool(
             name="calculator",
             description="Evaluate mathematical expressions",
             input_schema={
@@ -46,137 +72,171 @@ class TestConverter(unittest.TestCase):
             }
         )
 
-        self.tool_request = MessagesRequest(
+        cls.tool_request = ClaudeMessagesRequest(
             model="claude-3-sonnet-20240229",
             max_tokens=300,
             messages=[
-                Message(role="user", content="Calculate 2+2")
+                ClaudeMessage(role="user", content="Calculate 2+2")
             ],
-            tools=[self.calculator_tool],
+            tools=[cls.calculator_tool],
             tool_choice={"type": "auto"}
         )
 
     def test_simple_request_conversion(self):
         """Test conversion of a simple request"""
-        litellm_request = convert_anthropic_to_litellm(self.simple_request)
+        openai_request = convert_claude_to_openai(self.simple_request, model_manager)
 
         # Check basic structure
-        self.assertEqual(litellm_request["model"], "claude-3-sonnet-20240229")
-        self.assertEqual(litellm_request["max_tokens"], 300)
-        self.assertEqual(litellm_request["temperature"], 1.0)
+        self.assertEqual(openai_request["model"], config.middle_model)
+        self.assertEqual(openai_request["max_tokens"], 300)
+        self.assertEqual(openai_request["temperature"], 1.0)
 
         # Check messages
-        self.assertEqual(len(litellm_request["messages"]), 1)
-        self.assertEqual(litellm_request["messages"][0]["role"], "user")
-        self.assertEqual(litellm_request["messages"][0]["content"], "Hello, world!")
+        self.assertEqual(len(openai_request["messages"]), 1)
+        self.assertEqual(openai_request["messages"][0]["role"], "user")
+        self.assertEqual(openai_request["messages"][0]["content"], "Hello, world!")
 
     def test_system_request_conversion(self):
         """Test conversion of a request with system prompt"""
-        litellm_request = convert_anthropic_to_litellm(self.system_request)
+        openai_request = convert_claude_to_openai(self.system_request, model_manager)
 
         # Check system message is included
-        self.assertEqual(len(litellm_request["messages"]), 2)
-        self.assertEqual(litellm_request["messages"][0]["role"], "system")
-        self.assertEqual(litellm_request["messages"][0]["content"], "You are a helpful assistant.")
+        self.assertEqual(len(openai_request["messages"]), 2)
+        self.assertEqual(openai_request["messages"][0]["role"], "system")
+        self.assertEqual(openai_request["messages"][0]["content"], "You are a helpful assistant.")
 
         # Check user message
-        self.assertEqual(litellm_request["messages"][1]["role"], "user")
-        self.assertEqual(litellm_request["messages"][1]["content"], "Tell me about Paris.")
+        self.assertEqual(openai_request["messages"][1]["role"], "user")
+        self.assertEqual(openai_request["messages"][1]["content"], "Tell me about Paris.")
 
     def test_tool_request_conversion(self):
         """Test conversion of a request with tools"""
-        litellm_request = convert_anthropic_to_litellm(self.tool_request)
+        openai_request = convert_claude_to_openai(self.tool_request, model_manager)
 
         # Check tools are properly converted
-        self.assertIn("tools", litellm_request)
-        self.assertEqual(len(litellm_request["tools"]), 1)
-        self.assertEqual(litellm_request["tools"][0]["type"], "function")
-        self.assertEqual(litellm_request["tools"][0]["function"]["name"], "calculator")
+        self.assertIn("tools", openai_request)
+        self.assertEqual(len(openai_request["tools"]), 1)
+        self.assertEqual(openai_request["tools"][0]["type"], "function")
+        self.assertEqual(openai_request["tools"][0]["function"]["name"], "calculator")
 
         # Check tool_choice
-        self.assertEqual(litellm_request["tool_choice"], "auto")
-
-    def test_litellm_to_anthropic_text_response(self):
-        """Test conversion of a text response from LiteLLM to Anthropic format"""
-        # Mock LiteLLM response
-        litellm_response = MagicMock()
-        litellm_response.id = "resp_abc123"
-        litellm_response.choices = [MagicMock()]
-        litellm_response.choices[0].message.content = "Hello, this is a test response."
-        litellm_response.choices[0].finish_reason = "stop"
-        litellm_response.usage.prompt_tokens = 10
-        litellm_response.usage.completion_tokens = 20
+        self.assertEqual(openai_request["tool_choice"], "auto")
+
+    def test_tool_result_json_is_compact_and_exact(self):
+        """Structured tool results use one compact style whatever their values"""
+        self.assertEqual(parse_tool_result_content({"a": 1, "b": "x"}), '{"a":1,"b":"x"}')
+        self.assertEqual(parse_tool_result_content({"a": None}), '{"a":null}')
+        self.assertEqual(parse_tool_result_content({"n": 2**70}), '{"n":1180591620717411303424}')
+        self.assertEqual(parse_tool_result_content({"n": float("nan")}), '{"n":NaN}')
+
+    def test_openai_to_claude_text_response(self):
+        """Test conversion of a text response from OpenAI to Claude format"""
+        openai_response = make_chat_completion(
+            {"role": "assistant", "content": "Hello, this is a test response."},
+            "stop",
+            prompt_tokens=10,
+            completion_tokens=20
+        )
 
-        anthropic_response = convert_litellm_to_anthropic(litellm_response, self.simple_request)
+        claude_response = convert_openai_to_claude_response(openai_response, self.simple_request)
 
         # Check basic structure
-        self.assertEqual(anthropic_response.id, "resp_abc123")
-        self.assertEqual(anthropic_response.model, "claude-3-sonnet-20240229")
-        self.assertEqual(anthropic_response.role, "assistant")
-        self.assertEqual(anthropic_response.stop_reason, "end_turn")
+        self.assertEqual(claude_response["id"], "chatcmpl-abc123")
+        self.assertEqual(claude_response["model"], "claude-3-sonnet-20240229")
+        self.assertEqual(claude_response["role"], "assistant")
+        self.assertEqual(claude_response["stop_reason"], "end_turn")
 
         # Check content
-        self.assertEqual(len(anthropic_response.content), 1)
-        self.assertEqual(anthropic_response.content[0]["type"], "text")
-        self.assertEqual(anthropic_response.content[0]["text"], "Hello, this is a test response.")
+        self.assertEqual(
+            claude_response["content"],
+            [{"type": "text", "text": "Hello, this is a test response."}]
+        )
 
         # Check usage
-        self.assertEqual(anthropic_response.usage.input_tokens, 10)
-        self.assertEqual(anthropic_response.usage.output_tokens, 20)
-
-    def test_litellm_to_anthropic_tool_response(self):
-        """Test conversion of a tool use response from LiteLLM to Anthropic format"""
-        # Mock LiteLLM response with tool calls
-        litellm_response = MagicMock()
-        litellm_response.id = "resp_tool123"
-        litellm_response.choices = [MagicMock()]
-        litellm_response.choices[0].message.content = "I'll calculate that for you."
-
-        # Add tool_calls to the message
-        tool_call = MagicMock()
-        tool_call.id = "call_abc123"
-        tool_call.function.name = "calculator"
-        tool_call.function.arguments = json.dumps({"expression": "2+2"})
-        litellm_response.choices[0].message.tool_calls = [tool_call]
+        self.assertEqual(claude_response["usage"], {"input_tokens": 10, "output_tokens": 20})
+
+    def test_openai_to_claude_tool_response(self):
+        """Test conversion of a tool call response from OpenAI to Claude format"""
+        openai_response = make_chat_completion(
+            {
+                "role": "assistant",
+                "content": "I'll calculate that for you.",
+                "tool_calls": [{
+                    "id": "call_abc123",
+                    "type": "function",
+                    "function": {
+                        "name": "calculator",
+                        "arguments": json.dumps({"expression": "2+2"})
+                    }
+                }]
+            },
+            "tool_calls",
+            prompt_tokens=15,
+            completion_tokens=25
+        )
 
-        litellm_response.choices[0].finish_reason = "tool_calls"
-        litellm_response.usage.prompt_tokens = 15
-        litellm_response.usage.completion_tokens = 25
+        claude_response = convert_openai_to_claude_response(openai_response, self.tool_request)
 
-        # Set is_claude_model to True by manipulating the model name
-        self.tool_request.model = "claude-3-sonnet-20240229"
+        # Text comes before the tool use block
+        self.assertEqual(
+            claude_response["content"][0],
+            {"type": "text", "text": "I'll calculate that for you."}
+        )
+        self.assertEqual(
+            claude_response["content"][1],
+            {
+                "type": "tool_use",
+                "id": "call_abc123",
+                "name": "calculator",
+                "input": {"expression": "2+2"}
+            }
+        )
 
-        anthropic_response = convert_litellm_to_anthropic(litellm_response, self.tool_request)
+        # Check stop reason is tool_use
+        self.assertEqual(claude_response["stop_reason"], "tool_use")
+
+    def test_dict_and_chat_completion_convert_alike(self):
+        """Plain dict responses and SDK objects produce the same Claude message"""
+        openai_response = make_chat_completion(
+            {
+                "role": "assistant",
+                "content": "Sure",
+                "tool_calls": [{
+                    "id": "call_abc123",
+                    "type": "function",
+                    "function": {"name": "calculator", "arguments": "{not json"}
+                }]
+            },
+            "tool_calls",
+            prompt_tokens=15,
+            completion_tokens=25
+        )
 
-        # Check for tool use in content
-        self.assertTrue(any(block.get("type") == "tool_use" for block in anthropic_response.content))
+        self.assertEqual(
+            convert_openai_to_claude_response(openai_response, self.tool_request),
+            convert_openai_to_claude_response(openai_response.model_dump(), self.tool_request)
+        )
 
-        # Find the tool use block
-        tool_use_block = next((block for block in anthropic_response.content if block.get("type") == "tool_use"), None)
+    def test_tool_conversion_is_cached_by_content(self):
+        """Resent tool lists reuse the cached conversion without aliasing requests"""
+        first = convert_claude_tools([self.calculator_tool])
+        again = convert_claude_tools([self.calculator_tool.model_copy(deep=True)])
+        self.assertIs(first, again)
 
-        # Check tool use structure
-        self.assertIsNotNone(tool_use_block)
-        self.assertEqual(tool_use_block["name"], "calculator")
-        self.assertEqual(tool_use_block["input"]["expression"], "2+2")
+        # The cached schema is a private copy of the request's schema
+        self.assertEqual(first[0]["function"]["parameters"], self.calculator_tool.input_schema)
+        self.assertIsNot(first[0]["function"]["parameters"], self.calculator_tool.input_schema)
 
-        # Check stop reason is tool_use
-        self.assertEqual(anthropic_response.stop_reason, "tool_use")
+        changed = self.calculator_tool.model_copy(update={"description": "Do maths"})
+        self.assertEqual(convert_claude_tools([changed])[0]["function"]["description"], "Do maths")
 
     def test_error_handling(self):
         """Test error handling in conversion"""
-        # Simulate a conversion error
-        with patch('src.services.converter.logger') as mock_logger:
-            # Create a response that will cause an error when accessing attributes
-            bad_response = object()
-
-            # This should not raise an exception but return an error message
-            result = convert_litellm_to_anthropic(bad_response, self.simple_request)
-
-            # Verify logger was called with error
-            self.assertTrue(mock_logger.error.called)
+        # A response without choices cannot be converted
+        with self.assertRaises(HTTPException) as ctx:
+            convert_openai_to_claude_response({"choices": []}, self.simple_request)
 
-            # Verify error response was created
-            self.assertIn("Error converting response", result.content[0]["text"])
+        self.assertEqual(ctx.exception.status_code, 500)
 
 
 if __name__ == '__main__':
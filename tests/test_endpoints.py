@@ -0,0 +1,70 @@
+import json
+import unittest
+
+import httpx
+from fastapi.testclient import TestClient
+from openai import AsyncOpenAI
+
+from src.api import endpoints
+from src.main import app
+
+
+class TestMessagesEndpoint(unittest.TestCase):
+    """Test /v1/messages against a mocked upstream"""
+
+    def setUp(self):
+        """Route the shared OpenAI client to an in-process mock transport"""
+        self.upstream_response = None
+        self.original_client = endpoints.openai_client.client
+        endpoints.openai_client.client = AsyncOpenAI(
+            api_key="test-key",
+            base_url="http://upstream.test/v1",
+            http_client=httpx.AsyncClient(transport=httpx.MockTransport(self.handle)),
+        )
+        self.client = TestClient(app)
+
+    def tearDown(self):
+        endpoints.openai_client.client = self.original_client
+
+    def handle(self, request):
+        return httpx.Response(200, json=self.upstream_response)
+
+    def test_tool_arguments_with_big_integers(self):
+        """Integers wider than 64 bits in tool input are returned exactly"""
+        self.upstream_response = {
+            "id": "chatcmpl-abc123",
+            "object": "chat.completion",
+            "created": 1,
+            "model": "gpt-4o",
+            "choices": [{
+                "index": 0,
+                "finish_reason": "tool_calls",
+                "message": {
+                    "role": "assistant",
+                    "content": None,
+                    "tool_calls": [{
+                        "id": "call_abc123",
+                        "type": "function",
+                        "function": {
+                            "name": "store",
+                            "arguments": '{"n": 123456789012345678901234567890}'
+                        }
+                    }]
+                }
+            }],
+            "usage": {"prompt_tokens": 5, "completion_tokens": 7, "total_tokens": 12},
+        }
+
+        response = self.client.post("/v1/messages", json={
+            "model": "claude-3-haiku-20240307",
+            "max_tokens": 100,
+            "messages": [{"role": "user", "content": "Store the number"}],
+        })
+
+        self.assertEqual(response.status_code, 200)
+        tool_use = json.loads(response.text)["content"][0]
+        self.assertEqual(tool_use["input"], {"n": 123456789012345678901234567890})
+
+
+if __name__ == '__main__':
+    unittest.main()
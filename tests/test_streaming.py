@@ -0,0 +1,367 @@
+import asyncio
+import json
+import logging
+import unittest
+
+from openai.types.chat import ChatCompletionChunk
+
+from src.api.endpoints import _coalesce_frames
+from src.models.claude import ClaudeMessagesRequest, ClaudeMessage
+from src.conversion.response_converter import (
+    convert_openai_streaming_to_claude_with_cancellation,
+)
+
+logger = logging.getLogger(__name__)
+
+
+def make_chunk(delta=None, finish_reason=None, usage=None):
+    """Build a real SDK ChatCompletionChunk, as the OpenAI client streams it"""
+    chunk = {
+        "id": "chatcmpl-1",
+        "object": "chat.completion.chunk",
+        "created": 1,
+        "model": "gpt-4o",
+        "choices": [],
+    }
+    if delta is not None or finish_reason is not None:
+        chunk["choices"] = [{"index": 0, "delta": delta or {}, "finish_reason": finish_reason}]
+    if usage is not None:
+        chunk["usage"] = usage
+    return ChatCompletionChunk.model_validate(chunk)
+
+
+def tool_delta(index, arguments, tool_id=None, name=None):
+    """A tool_calls delta; id and name only come with the first one"""
+    function = {"arguments": arguments}
+    call = {"index": index, "function": function}
+    if tool_id:
+        call["id"] = tool_id
+        call["type"] = "function"
+        function["name"] = name
+    return {"tool_calls": [call]}
+
+
+async def stream_of(chunks, closed=None):
+    """Async generator over chunks; records in `closed` when it is closed"""
+    try:
+        for chunk in chunks:
+            yield chunk
+    finally:
+        if closed is not None:
+            closed.append(True)
+
+
+def parse_events(frames):
+    """Split emitted SSE bytes into a compact (event, ...) summary"""
+    summary = []
+    for block in b"".join(frames).decode().split("\n\n"):
+        if not block:
+            continue
+        event_line, data_line = block.split("\n")
+        event = event_line.removeprefix("event: ")
+        data = json.loads(data_line.removeprefix("data: "))
+        if event == "content_block_start":
+            summary.append(("start", data["index"], data["content_block"]["type"]))
+        elif event == "content_block_delta":
+            delta = data["delta"]
+            value = delta.get("text", delta.get("thinking", delta.get("partial_json")))
+            summary.append(("delta", data["index"], delta["type"], value))
+        elif event == "content_block_stop":
+            summary.append(("stop", data["index"]))
+        elif event == "message_delta":
+            summary.append(("message_delta", data["delta"]["stop_reason"], data["usage"]))
+        else:
+            summary.append((event,))
+    return summary
+
+
+class FakeRequest:
+    """Stand-in for starlette's Request: disconnects after `connected_checks`"""
+
+    def __init__(self, connected_checks):
+        self.connected_checks = connected_checks
+
+    async def is_disconnected(self):
+        self.connected_checks -= 1
+        return self.connected_checks < 0
+
+
+class TestStreamingConverter(unittest.IsolatedAsyncioTestCase):
+    """Test the OpenAI -> Claude streaming conversion"""
+
+    @classmethod
+    def setUpClass(cls):
+        """Setup common test data once"""
+        cls.request = ClaudeMessagesRequest(
+            model="claude-3-sonnet-20240229",
+            max_tokens=300,
+            messages=[ClaudeMessage(role="user", content="Hello")],
+            stream=True
+        )
+
+    async def convert(self, chunks, **kwargs):
+        frames = []
+        async for frame in convert_openai_streaming_to_claude_with_cancellation(
+            stream_of(chunks, kwargs.pop("closed", None)), self.request, logger, **kwargs
+        ):
+            frames.append(frame)
+        return parse_events(frames)
+
+    async def test_text_only(self):
+        """Text opens the first block at index 0; empty deltas are dropped"""
+        events = await self.convert([
+            make_chunk({"role": "assistant", "content": ""}),
+            make_chunk({"content": "Hel"}),
+            make_chunk({"content": "lo"}),
+            make_chunk(finish_reason="stop"),
+            make_chunk(usage={"prompt_tokens": 5, "completion_tokens": 2, "total_tokens": 7}),
+        ])
+
+        self.assertEqual(events, [
+            ("message_start",),
+            ("ping",),
+            ("start", 0, "text"),
+            ("delta", 0, "text_delta", "Hel"),
+            ("delta", 0, "text_delta", "lo"),
+            ("stop", 0),
+            ("message_delta", "end_turn",
+             {"input_tokens": 5, "output_tokens": 2, "cache_read_input_tokens": 0}),
+            ("message_stop",),
+        ])
+
+    async def test_empty_stream(self):
+        """A stream without content still ends with one empty text block"""
+        events = await self.convert([make_chunk(finish_reason="stop")])
+
+        self.assertEqual(events[2:4], [("start", 0, "text"), ("stop", 0)])
+
+    async def test_thinking_then_text(self):
+        """Thinking opens block 0; text then opens block 1"""
+        events = await self.convert([
+            make_chunk({"reasoning_content": "think"}),
+            make_chunk({"reasoning_content": " more"}),
+            make_chunk({"content": "answer"}),
+            make_chunk(finish_reason="length"),
+        ])
+
+        self.assertEqual(events[2:], [
+            ("start", 0, "thinking"),
+            ("delta", 0, "thinking_delta", "think"),
+            ("delta", 0, "thinking_delta", " more"),
+            ("stop", 0),
+            ("start", 1, "text"),
+            ("delta", 1, "text_delta", "answer"),
+            ("stop", 1),
+            ("message_delta", "max_tokens", {"input_tokens": 0, "output_tokens": 0}),
+            ("message_stop",),
+        ])
+
+    async def test_thinking_with_empty_content(self):
+        """OpenRouter-style chunks with content "" keep one thinking block open"""
+        events = await self.convert([
+            make_chunk({"reasoning_content": "think", "content": ""}),
+            make_chunk({"reasoning_content": " more", "content": ""}),
+            make_chunk({"content": "answer"}),
+            make_chunk(finish_reason="stop"),
+        ])
+
+        self.assertEqual(events[2:-2], [
+            ("start", 0, "thinking"),
+            ("delta", 0, "thinking_delta", "think"),
+            ("delta", 0, "thinking_delta", " more"),
+            ("stop", 0),
+            ("start", 1, "text"),
+            ("delta", 1, "text_delta", "answer"),
+            ("stop", 1),
+        ])
+
+    async def test_text_then_tool(self):
+        """The text block is closed before the tool block starts"""
+        events = await self.convert([
+            make_chunk({"content": "Let me"}),
+            make_chunk(tool_delta(0, "", tool_id="call_1", name="calculator")),
+            make_chunk(tool_delta(0, '{"expression": ')),
+            make_chunk(tool_delta(0, '"2+2"}')),
+            make_chunk(finish_reason="tool_calls"),
+        ])
+
+        self.assertEqual(events[2:-2], [
+            ("start", 0, "text"),
+            ("delta", 0, "text_delta", "Let me"),
+            ("stop", 0),
+            ("start", 1, "tool_use"),
+            ("delta", 1, "input_json_delta", '{"expression": '),
+            ("delta", 1, "input_json_delta", '"2+2"}'),
+            ("stop", 1),
+        ])
+        self.assertEqual(events[-2][1], "tool_use")
+
+    async def test_parallel_tools(self):
+        """Interleaved argument deltas go to the block of their own tool"""
+        events = await self.convert([
+            make_chunk(tool_delta(0, "", tool_id="call_1", name="calculator")),
+            make_chunk(tool_delta(1, "", tool_id="call_2", name="weather")),
+            make_chunk(tool_delta(0, '{"expression": "2+2"}')),
+            make_chunk(tool_delta(1, '{"city": "Paris"}')),
+            make_chunk(finish_reason="tool_calls"),
+        ])
+
+        self.assertEqual(events[2:-2], [
+            ("start", 0, "tool_use"),
+            ("start", 1, "tool_use"),
+            ("delta", 0, "input_json_delta", '{"expression": "2+2"}'),
+            ("delta", 1, "input_json_delta", '{"city": "Paris"}'),
+            ("stop", 0),
+            ("stop", 1),
+        ])
+
+    async def test_no_index_is_reopened(self):
+        """Every block index is started once and stopped once"""
+        events = await self.convert([
+            make_chunk({"reasoning_content": "a", "content": ""}),
+            make_chunk({"content": "b"}),
+            make_chunk({"reasoning_content": "c"}),
+            make_chunk(tool_delta(0, "{}", tool_id="call_1", name="calculator")),
+            make_chunk({"content": "d"}),
+            make_chunk(finish_reason="stop"),
+        ])
+
+        starts = [event[1] for event in events if event[0] == "start"]
+        stops = [event[1] for event in events if event[0] == "stop"]
+        self.assertEqual(starts, [0, 1, 2, 3, 4])
+        self.assertEqual(sorted(stops), starts)
+
+    async def test_disconnect_closes_upstream(self):
+        """A client disconnect stops reading and closes the upstream stream"""
+        closed = []
+        events = await self.convert(
+            [
+                make_chunk({"content": "one"}),
+                make_chunk({"content": "two"}),
+                make_chunk({"content": "three"}),
+            ],
+            closed=closed,
+            http_request=FakeRequest(connected_checks=1),
+            request_id="req-1",
+        )
+
+        self.assertEqual(closed, [True])
+        deltas = [event[3] for event in events if event[0] == "delta"]
+        self.assertEqual(deltas, ["one"])
+
+    async def test_merge_window(self):
+        """With a merge window, deltas after a block's first are sent as one"""
+        events = await self.convert(
+            [
+                make_chunk({"reasoning_content": "a"}),
+                make_chunk({"reasoning_content": "b"}),
+                make_chunk({"content": "c"}),
+                make_chunk({"content": "d"}),
+                make_chunk({"content": "e"}),
+                make_chunk(finish_reason="stop"),
+            ],
+            merge_window=60.0,
+        )
+
+        deltas = [event[1:] for event in events if event[0] == "delta"]
+        self.assertEqual(deltas, [
+            (0, "thinking_delta", "a"),
+            (0, "thinking_delta", "b"),
+            (1, "text_delta", "c"),
+            (1, "text_delta", "de"),
+        ])
+
+    async def test_merge_flushes_at_size_limit(self):
+        """Merged text is flushed early once it reaches the size limit"""
+        events = await self.convert(
+            [
+                make_chunk({"content": "x" * 200}),
+                make_chunk({"content": "y" * 200}),
+                make_chunk({"content": "z" * 200}),
+                make_chunk(finish_reason="stop"),
+            ],
+            merge_window=60.0,
+        )
+
+        deltas = [event[3] for event in events if event[0] == "delta"]
+        self.assertEqual(deltas, ["x" * 200, "y" * 200 + "z" * 200])
+
+    async def test_merge_window_expires_during_upstream_stall(self):
+        """Held text goes out once the window passes, not with the next chunk"""
+        closed = []
+        source = timed_frames(
+            [
+                (0, make_chunk({"content": "a"})),
+                (0, make_chunk({"content": "b"})),
+                (0.3, make_chunk({"content": "c"})),
+                (0, make_chunk(finish_reason="stop")),
+            ],
+            closed,
+        )
+        writes = []
+        async for frame in convert_openai_streaming_to_claude_with_cancellation(
+            source, self.request, logger, merge_window=0.05
+        ):
+            writes.append(parse_events([frame]))
+
+        deltas = [
+            [event[3] for event in write if event[0] == "delta"] for write in writes
+        ]
+        self.assertEqual([d for d in deltas if d], [["a"], ["b"], ["c"]])
+        self.assertEqual(closed, [True])
+
+
+async def timed_frames(frames, closed, fail=False):
+    """Yield each frame after its delay; optionally raise at the end"""
+    try:
+        for delay, frame in frames:
+            if delay:
+                await asyncio.sleep(delay)
+            yield frame
+        if fail:
+            raise RuntimeError("upstream failed")
+    finally:
+        closed.append(True)
+
+
+class TestCoalesceFrames(unittest.IsolatedAsyncioTestCase):
+    """Test SSE frame coalescing (SSE_COALESCE_MS)"""
+
+    async def test_batches_frames_within_window(self):
+        """The first frame goes out alone; close followers share one write"""
+        closed = []
+        source = timed_frames(
+            [(0, b"a"), (0, b"b"), (0, b"c"), (0.3, b"d")], closed
+        )
+
+        writes = [frame async for frame in _coalesce_frames(source, 0.05)]
+
+        self.assertEqual(writes, [b"a", b"bc", b"d"])
+        self.assertEqual(closed, [True])
+
+    async def test_close_closes_source(self):
+        """Closing the coalescer early also closes the source stream"""
+        closed = []
+        source = timed_frames([(0, b"a"), (0, b"b"), (10, b"c")], closed)
+        coalesced = _coalesce_frames(source, 0.05)
+
+        self.assertEqual(await anext(coalesced), b"a")
+        await coalesced.aclose()
+
+        self.assertEqual(closed, [True])
+
+    async def test_source_error_flushes_buffer(self):
+        """Frames buffered before a source error are still delivered"""
+        closed = []
+        source = timed_frames([(0, b"a"), (0, b"b"), (0, b"c")], closed, fail=True)
+        writes = []
+
+        with self.assertRaises(RuntimeError):
+            async for frame in _coalesce_frames(source, 10.0):
+                writes.append(frame)
+
+        self.assertEqual(writes, [b"a", b"bc"])
+
+
+if __name__ == '__main__':
+    unittest.main()